@@ -1,8 +1,9 @@
 import falcon
 
 from minesweeper.config import config
+from minesweeper.common.exceptions import GameConflictException
 from minesweeper.common.logging import setup_logger
-from minesweeper.databases.mongo import connect_to_mongo_db
+from minesweeper.databases.base import setup_repository
 from minesweeper.middlewares import *
 from minesweeper.resources.game import GameResource
 from minesweeper.resources.game_action import GameActionResource
@@ -17,7 +18,14 @@ config.load()
 logger = setup_logger()
 
 # Connect to the application database
-connect_to_mongo_db()
+repository = setup_repository()
+repository.connect()
+repository.ensure_indexes()
+
+# Close the connections opened for building the indexes, so that processes forked from this one don't inherit
+# them (the repository reconnects on first use)
+repository.disconnect()
+repository.connect()
 
 # Create application middlewares
 middleware = [
@@ -30,6 +38,7 @@ app = application = falcon.API(middleware=middleware)
 
 # Add app special handlers
 app.add_error_handler(Exception, internal_error_handler)
+app.add_error_handler(GameConflictException, conflict_error_handler)
 
 # Setup Test resource endpoints
 test_resource = TestResource()
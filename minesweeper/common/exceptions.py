@@ -8,3 +8,9 @@ class AuthException(Exception):
     """Authorization exception class
     """
     pass
+
+
+class GameConflictException(MinesweeperException):
+    """Exception raised when a game was changed by someone else while an action was being applied to it
+    """
+    pass
@@ -0,0 +1,2 @@
+# Media type of the newline-delimited JSON responses of collections
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
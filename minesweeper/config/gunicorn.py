@@ -0,0 +1,55 @@
+"""Gunicorn configuration for the Minesweeper API (run with `gunicorn -c python:minesweeper.config.gunicorn`).
+
+The application is loaded once in the master process and then forked into the workers. Database connection
+pools cannot be shared across processes, so each worker builds (and warms up) its own pool after being forked.
+
+A single worker is run unless `MINESWEEPER_WORKERS` says otherwise (e.g. `2 * cpu_count + 1` for MongoDB). The
+`memory` and `sqlite` database backends, as well as the write-behind buffer, keep their state in the memory of
+the worker, so they refuse to start with more than one.
+"""
+import os
+
+from minesweeper.config import config
+from minesweeper.databases.base import get_repository
+from minesweeper.databases.buffer import game_buffer
+
+
+bind = os.getenv('MINESWEEPER_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('MINESWEEPER_WORKERS', 1))
+preload_app = True
+wsgi_app = 'minesweeper.app'
+
+
+def on_starting(server):
+    """Checks the number of workers suits the application configuration, once it has been preloaded.
+
+    :raise RuntimeError: If workers would keep state in memory that others can't see (gunicorn reports the error
+    and exits)
+    """
+    if server.num_workers <= 1:
+        return
+
+    backend = config['database'].get('backend', 'mongo')
+    if backend != 'mongo':
+        raise RuntimeError(f'The {backend} database backend requires a single worker (set MINESWEEPER_WORKERS=1).')
+    if game_buffer.enabled:
+        raise RuntimeError('The game write-behind buffer requires a single worker (set MINESWEEPER_WORKERS=1).')
+
+
+def post_fork(server, worker):
+    """Replaces the connection pool inherited from the master process with a new one for the worker.
+    """
+    get_repository().disconnect()
+    get_repository().connect()
+
+
+def post_worker_init(worker):
+    """Opens the worker database connections before it starts serving requests.
+    """
+    get_repository().warm_up()
+
+
+def worker_exit(server, worker):
+    """Persists the actions held by the worker write-behind buffer before it exits.
+    """
+    game_buffer.flush()
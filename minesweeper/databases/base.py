@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+
+from minesweeper.common.exceptions import MinesweeperException
+from minesweeper.config import config
+
+
+# The repository used by the application, see `setup_repository`
+_repository = None
+
+
+class BaseRepository(ABC):
+    """Abstract class for modeling the storage backend of the application models.
+
+    Repositories load and persist model instances (mongoengine documents) without the models knowing where they
+    are stored. Queries and updates are expressed as MongoDB filter and update documents (on database field
+    names), as every backend supports at least the following subset of them:
+
+        - Filters: field equality (dotted paths allowed), `$lt`, `$lte`, `$gt`, `$gte`, `$ne`, `$in`, `$and`
+          and `$or`
+        - Updates: `$set` (dotted paths and array positions allowed), `$inc`, `$min` and `$max`
+
+    .note: Backends must raise `mongoengine.NotUniqueError` whenever a write violates a unique index. Instances
+    loaded with only some of their fields are meant to be read, and must never be saved as a whole.
+    """
+
+    def connect(self):
+        """Sets up the connections to the storage backend.
+        """
+        pass
+
+    def disconnect(self):
+        """Closes the connections to the storage backend.
+        """
+        pass
+
+    def warm_up(self):
+        """Opens the connections to the storage backend ahead of the first request.
+        """
+        pass
+
+    def ensure_indexes(self):
+        """Creates the indexes declared by the application models, unless they already exist.
+        """
+        pass
+
+    @abstractmethod
+    def get(self, model_cls, identifier, only=None):
+        """Retrieves a model instance by its id.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param identifier: The id of the instance to be retrieved
+        :type identifier: bson.ObjectId
+        :param only: The names of the only fields to be loaded, or None to load all of them
+        :type only: tuple | NoneType
+        :return: The model instance, or None if it doesn't exist
+        :rtype: mongoengine.Document | NoneType
+        """
+        pass
+
+    @abstractmethod
+    def find(self, model_cls, query=None, sort=None, limit=None, only=None):
+        """Retrieves the model instances matching a query.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param query: A MongoDB filter document, or None to retrieve every instance
+        :type query: dict | NoneType
+        :param sort: A list of (field, direction) tuples to sort the instances by
+        :type sort: list | NoneType
+        :param limit: The maximum number of instances to be retrieved
+        :type limit: int | NoneType
+        :param only: The names of the only fields to be loaded, or None to load all of them
+        :type only: tuple | NoneType
+        :return: An iterator over the matching instances
+        :rtype: iterator
+        """
+        pass
+
+    @abstractmethod
+    def save(self, document):
+        """Persists a whole model instance, either by inserting it or by replacing its stored version.
+
+        .note: Documents get validated and go through the mongoengine save signals, as with `Document.save`.
+
+        :param document: A model instance
+        :type document: mongoengine.Document
+        """
+        pass
+
+    @abstractmethod
+    def insert(self, document):
+        """Persists a new model instance.
+
+        :param document: A model instance
+        :type document: mongoengine.Document
+
+        :raise mongoengine.NotUniqueError: If the instance violates any unique index
+        """
+        pass
+
+    @abstractmethod
+    def insert_all(self, documents):
+        """Persists a batch of new model instances of the same model class, in the given order.
+
+        :param documents: A list of model instances
+        :type documents: list
+
+        :raise mongoengine.NotUniqueError: If any of the instances violates a unique index, in which case the
+        instances that follow it are not persisted
+        """
+        pass
+
+    @abstractmethod
+    def update(self, model_cls, query, update, upsert=False):
+        """Updates the first model instance matching a query.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param query: A MongoDB filter document
+        :type query: dict
+        :param update: A MongoDB update document
+        :type update: dict
+        :param upsert: Whether to insert a new instance when none matches the query
+        :type upsert: bool
+        :return: True if an instance was either updated or inserted, False otherwise
+        :rtype: bool
+
+        :raise mongoengine.NotUniqueError: If the update violates any unique index
+        """
+        pass
+
+    @abstractmethod
+    def update_all(self, model_cls, updates, upsert=False):
+        """Performs a batch of updates, each of them on the first model instance matching its query.
+
+        .note: Every update is attempted even if some of them fail.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param updates: A list of (query, update) tuples of MongoDB filter and update documents
+        :type updates: list
+        :param upsert: Whether to insert a new instance when none matches the query of an update
+        :type upsert: bool
+
+        :raise mongoengine.NotUniqueError: If any of the updates violates a unique index
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, document):
+        """Removes a model instance, along with the instances that cascade from it.
+
+        :param document: A model instance
+        :type document: mongoengine.Document
+        """
+        pass
+
+
+def get_repository():
+    """Returns the repository used by the application.
+
+    :return: The application repository
+    :rtype: minesweeper.databases.base.BaseRepository
+    """
+    return _repository
+
+
+def setup_repository():
+    """Creates the repository for the storage backend set in the application configuration.
+
+    :return: The application repository
+    :rtype: minesweeper.databases.base.BaseRepository
+
+    :raise MinesweeperException: If the configured storage backend is unknown
+    """
+    global _repository
+
+    # Backends are imported here as they depend on the application models
+    backend = config['database'].get('backend', 'mongo')
+    if backend == 'mongo':
+        from .mongo import MongoRepository
+        _repository = MongoRepository()
+    elif backend == 'memory':
+        from .memory import MemoryRepository
+        _repository = MemoryRepository()
+    elif backend == 'sqlite':
+        from .sqlite import SQLiteRepository
+        _repository = SQLiteRepository(config['database'].get('sqlite_path', 'minesweeper.sqlite3'))
+    else:
+        raise MinesweeperException(f'Unknown database backend {backend}.')
+
+    return _repository
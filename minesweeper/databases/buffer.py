@@ -0,0 +1,132 @@
+import os
+import time
+from threading import (
+    RLock,
+    Thread,
+)
+
+from minesweeper.common.exceptions import GameConflictException
+from minesweeper.common.logging import get_app_logger
+from minesweeper.config import config
+
+
+class GameBuffer(object):
+    """Write-behind buffer of the games being played in the current process.
+
+    Buffered games are kept in memory, keyed by their ids, and their actions are only applied to the in-memory
+    instances. A background thread flushes the games with pending actions every `flush_interval_ms`, and games
+    are also flushed right away whenever their status changes (i.e. when they get paused or finished).
+
+    The buffer `lock` only guards the buffer itself: each game guards its own state, and games are flushed
+    without holding the buffer lock, so that actions on other games never wait for the database.
+
+    .note: Each game must always be played through the same process (e.g. by routing requests with a hash of
+    the game id), otherwise actions applied elsewhere conflict with the buffered ones once they get flushed.
+    """
+
+    def __init__(self):
+        self.lock = RLock()
+        self._games = {}
+        self._touched = {}
+        self._dirty = set()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        """Returns True when games are to be buffered, as set in the application configuration.
+
+        :return: True if games are to be buffered, False otherwise
+        :rtype: bool
+        """
+        return bool(self._config.get('enabled'))
+
+    @property
+    def _config(self):
+        return config['app']['game'].get('write_behind') or {}
+
+    def get(self, identifier):
+        """Retrieves a buffered game by its id.
+
+        :param identifier: The id of a game
+        :type identifier: string | bson.ObjectId
+        :return: The buffered game, or None if it is not buffered
+        :rtype: minesweeper.models.game.GameModel | NoneType
+        """
+        with self.lock:
+            game = self._games.get(str(identifier))
+            if game is not None:
+                self._touched[str(identifier)] = time.monotonic()
+            return game
+
+    def add(self, game):
+        """Buffers a game with pending actions, which get persisted on the next flush.
+
+        :param game: A game
+        :type game: minesweeper.models.game.GameModel
+        """
+        with self.lock:
+            key = str(game.id)
+            self._games[key] = game
+            self._touched[key] = time.monotonic()
+            self._dirty.add(key)
+
+        # Threads don't survive forks, so each process starts its own flusher
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            Thread(target=self._run, name='game-buffer-flusher', daemon=True).start()
+
+    def discard(self, identifier):
+        """Drops a game from the buffer, along with its pending actions.
+
+        :param identifier: The id of a game
+        :type identifier: string | bson.ObjectId
+        :return: The game dropped from the buffer, or None if it was not buffered
+        :rtype: minesweeper.models.game.GameModel | NoneType
+        """
+        with self.lock:
+            self._touched.pop(str(identifier), None)
+            self._dirty.discard(str(identifier))
+            return self._games.pop(str(identifier), None)
+
+    def flush(self):
+        """Persists the pending actions of every buffered game, and drops the games that have been idle for
+        longer than `idle_timeout_seconds`.
+
+        .note: Games that conflict with actions applied elsewhere are dropped, so that they get reloaded from
+        the database. Games failing to be flushed for any other reason keep their actions, and are retried on the
+        next flush.
+        """
+        with self.lock:
+            games = [self._games[key] for key in self._dirty]
+            self._dirty.clear()
+
+        for game in games:
+            try:
+                game.flush()
+            except GameConflictException:
+                get_app_logger().exception(f'Could not flush {game}, dropping it from the buffer')
+                self.discard(game.id)
+                game.drop()
+            except Exception:
+                get_app_logger().exception(f'Could not flush {game}, retrying on the next flush')
+                with self.lock:
+                    if self._games.get(str(game.id)) is game:
+                        self._dirty.add(str(game.id))
+
+        # Idle games have nothing left to flush, so they can be reloaded from the database at any time
+        with self.lock:
+            idle_since = time.monotonic() - self._config.get('idle_timeout_seconds', 300)
+            for key, touched in list(self._touched.items()):
+                if touched < idle_since and key not in self._dirty:
+                    self.discard(key)
+
+    def _run(self):
+        """Flushes the buffer on an interval, for as long as the process lives.
+        """
+        while True:
+            time.sleep(self._config.get('flush_interval_ms', 200) / 1000)
+            self.flush()
+
+
+# The write-behind buffer of the current process
+game_buffer = GameBuffer()
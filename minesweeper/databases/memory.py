@@ -0,0 +1,528 @@
+from copy import deepcopy
+from functools import lru_cache
+from threading import RLock
+
+from bson import ObjectId
+from mongoengine import (
+    CASCADE,
+    DENY,
+    NULLIFY,
+    NotUniqueError,
+    OperationError,
+    signals,
+)
+from mongoengine.fields import (
+    LazyReferenceField,
+    ReferenceField,
+)
+
+from .base import BaseRepository
+
+
+# Marker for paths missing from a stored document
+MISSING = object()
+
+
+class MemoryRepository(BaseRepository):
+    """Repository storing the application models in the memory of the current process.
+
+    Model instances are kept in their database representation (as returned by `Document.to_mongo`), in one dict
+    per collection keyed by their ids. Unique indexes are enforced, and delete rules are applied as MongoDB would.
+    Queries on ids are served straight from the collection dicts, and queries on the fields of `indexed_fields`
+    (e.g. the events of a game) only go through the documents holding the queried value.
+
+    .note: Nothing is persisted, and each process has its own store, so it is only meant for single-process
+    deployments, tests and benchmarks. References are loaded as stored, so models are expected to declare them
+    as `LazyReferenceField` (which provides the referenced id without loading the referenced instance).
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._unique_keys = {}
+        self._field_indexes = {}
+        self._lock = RLock()
+
+    def get(self, model_cls, identifier, only=None):
+        """Overwrites BaseRepository.get.
+
+        .note: Stored documents are always fully loaded, as projections would not save any I/O.
+        """
+        with self._lock:
+            son = self._collection(model_cls).get(ObjectId(identifier))
+            return None if son is None else self._load(model_cls, son)
+
+    def find(self, model_cls, query=None, sort=None, limit=None, only=None):
+        """Overwrites BaseRepository.find.
+
+        .note: Stored documents are always fully loaded, as projections would not save any I/O.
+        """
+        with self._lock:
+            sons = [son for son in self._candidates(model_cls, query or {}) if match(son, query or {})]
+
+        # Sort by each key in turn, starting from the least significant one
+        for field, direction in reversed(sort or []):
+            sons.sort(key=lambda son: sort_key(get_path(son, field)), reverse=direction < 0)
+
+        return (self._load(model_cls, son) for son in sons[:limit or None])
+
+    def save(self, document):
+        """Overwrites BaseRepository.save.
+        """
+        self._save(document, force_insert=False)
+
+    def insert(self, document):
+        """Overwrites BaseRepository.insert.
+        """
+        self._save(document, force_insert=True)
+
+    def insert_all(self, documents):
+        """Overwrites BaseRepository.insert_all.
+        """
+        with self._lock:
+            for document in documents:
+                self._save(document, force_insert=True)
+
+    def update(self, model_cls, query, update, upsert=False):
+        """Overwrites BaseRepository.update.
+        """
+        with self._lock:
+            try:
+                return self._update(model_cls, query, update, upsert)
+            finally:
+                self._flush()
+
+    def update_all(self, model_cls, updates, upsert=False):
+        """Overwrites BaseRepository.update_all.
+        """
+        with self._lock:
+            errors = []
+            for query, update in updates:
+                try:
+                    self._update(model_cls, query, update, upsert)
+                except NotUniqueError as err:
+                    errors.append(str(err))
+            self._flush()
+
+        if errors:
+            raise NotUniqueError('; '.join(errors))
+
+    def delete(self, document):
+        """Overwrites BaseRepository.delete.
+        """
+        signals.pre_delete.send(document.__class__, document=document)
+        with self._lock:
+            self._delete(document.__class__, document.id)
+            self._flush()
+        signals.post_delete.send(document.__class__, document=document)
+
+    def _save(self, document, force_insert):
+        """Validates and persists a model instance, going through the mongoengine save signals.
+
+        :param document: A model instance
+        :type document: mongoengine.Document
+        :param force_insert: Whether the instance must be new
+        :type force_insert: bool
+
+        :raise mongoengine.NotUniqueError: If the instance violates any unique index
+        """
+        model_cls = document.__class__
+        signals.pre_save.send(model_cls, document=document)
+        document.validate(clean=True)
+
+        with self._lock:
+            if document.id is None:
+                document.id = ObjectId()
+            created = force_insert or document.id not in self._collection(model_cls)
+            if force_insert and not created:
+                raise NotUniqueError(f'Duplicate id {document.id} in {model_cls._get_collection_name()}')
+
+            signals.pre_save_post_validation.send(model_cls, document=document, created=created)
+            self._store(model_cls, deepcopy(document.to_mongo().to_dict()))
+            self._flush()
+
+        document._clear_changed_fields()
+        document._created = False
+        signals.post_save.send(model_cls, document=document, created=created)
+
+    def _update(self, model_cls, query, update, upsert):
+        """Updates the first stored document matching a query.
+
+        :return: True if a document was either updated or inserted, False otherwise
+        :rtype: bool
+        """
+        son = next((son for son in self._candidates(model_cls, query) if match(son, query)), None)
+        if son is None:
+            if not upsert:
+                return False
+            son = {'_id': ObjectId()}
+            for path, condition in query.items():
+                if not path.startswith('$') and not is_operator(condition):
+                    set_path(son, path, deepcopy(condition))
+        else:
+            son = deepcopy(son)
+
+        apply_update(son, update)
+        self._store(model_cls, son)
+        return True
+
+    def _delete(self, model_cls, identifier):
+        """Removes a stored document, applying the delete rules of its model.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param identifier: The id of the document to be removed
+        :type identifier: bson.ObjectId
+
+        :raise mongoengine.OperationError: If a DENY delete rule prevents the document from being removed
+        """
+        for (ref_cls, field_name), rule in (model_cls._meta.get('delete_rules') or {}).items():
+            db_field = ref_cls._fields[field_name].db_field
+            refs = [son for son in self._candidates(ref_cls, {db_field: identifier}) if son.get(db_field) == identifier]
+            if not refs:
+                continue
+            if rule == DENY:
+                raise OperationError(f'Could not delete document ({ref_cls.__name__}.{field_name} refers to it)')
+            for ref in refs:
+                if rule == CASCADE:
+                    self._delete(ref_cls, ref['_id'])
+                elif rule == NULLIFY:
+                    ref = deepcopy(ref)
+                    ref.pop(db_field)
+                    self._store(ref_cls, ref)
+
+        self._discard(model_cls, identifier)
+
+    def _collection(self, model_cls):
+        """Returns the store of a model collection.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :return: The stored documents of the collection, keyed by id
+        :rtype: dict
+        """
+        return self._collections.setdefault(model_cls._get_collection_name(), {})
+
+    def _candidates(self, model_cls, query):
+        """Returns the stored documents that may match a query, narrowed down by the id or by any indexed field
+        the query asks to be equal to a value.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param query: A MongoDB filter document
+        :type query: dict
+        :return: An iterable over the candidate documents, which still need to be matched against the query
+        :rtype: iterable
+        """
+        collection = self._collection(model_cls)
+        if '_id' in query and not is_operator(query['_id']):
+            son = collection.get(query['_id'])
+            return () if son is None else (son,)
+
+        field_indexes = self._field_indexes.get(model_cls._get_collection_name(), {})
+        for db_field in indexed_fields(model_cls):
+            if db_field in query and not is_operator(query[db_field]):
+                ids = field_indexes.get(db_field, {}).get(index_value(query[db_field]), ())
+                return [collection[identifier] for identifier in ids]
+
+        # Documents matching any alternative of the query are among the candidates of each alternative
+        if '$or' in query:
+            candidates = {}
+            for alternative in query['$or']:
+                candidates.update((son['_id'], son) for son in self._candidates(model_cls, alternative))
+            return list(candidates.values())
+
+        return list(collection.values())
+
+    def _load(self, model_cls, son):
+        """Builds a model instance out of a stored document.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param son: A stored document
+        :type son: dict
+        :return: A model instance
+        :rtype: mongoengine.Document
+        """
+        document = model_cls._from_son(deepcopy(son))
+        document._clear_changed_fields()
+        return document
+
+    def _store(self, model_cls, son):
+        """Stores a document, replacing any stored document with the same id.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param son: The document to be stored
+        :type son: dict
+
+        :raise mongoengine.NotUniqueError: If the document violates any unique index
+        """
+        collection = self._collection(model_cls)
+        unique_keys = self._unique_keys.setdefault(model_cls._get_collection_name(), {})
+        previous = collection.get(son['_id'])
+
+        # Check the document unique keys are not taken by other documents
+        keys = unique_index_keys(model_cls, son)
+        for key in keys:
+            if unique_keys.get(key, son['_id']) != son['_id']:
+                raise NotUniqueError(f'Duplicate key {key[1]} in {model_cls._get_collection_name()}')
+
+        if previous is not None:
+            for key in unique_index_keys(model_cls, previous):
+                unique_keys.pop(key, None)
+            self._unindex(model_cls, previous)
+        for key in keys:
+            unique_keys[key] = son['_id']
+        collection[son['_id']] = son
+        self._index(model_cls, son)
+
+    def _discard(self, model_cls, identifier):
+        """Removes a stored document.
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param identifier: The id of the document to be removed
+        :type identifier: bson.ObjectId
+        """
+        son = self._collection(model_cls).pop(identifier, None)
+        if son is not None:
+            unique_keys = self._unique_keys.get(model_cls._get_collection_name(), {})
+            for key in unique_index_keys(model_cls, son):
+                unique_keys.pop(key, None)
+            self._unindex(model_cls, son)
+
+    def _index(self, model_cls, son):
+        """Adds a stored document to the indexes of its model fields (see `indexed_fields`).
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param son: A stored document
+        :type son: dict
+        """
+        field_indexes = self._field_indexes.setdefault(model_cls._get_collection_name(), {})
+        for db_field in indexed_fields(model_cls):
+            value = get_path(son, db_field, None)
+            field_indexes.setdefault(db_field, {}).setdefault(index_value(value), set()).add(son['_id'])
+
+    def _unindex(self, model_cls, son):
+        """Removes a stored document from the indexes of its model fields (see `indexed_fields`).
+
+        :param model_cls: A model class
+        :type model_cls: mongoengine.Document
+        :param son: A stored document
+        :type son: dict
+        """
+        field_indexes = self._field_indexes.get(model_cls._get_collection_name(), {})
+        for db_field in indexed_fields(model_cls):
+            ids = field_indexes.get(db_field, {}).get(index_value(get_path(son, db_field, None)))
+            if ids is not None:
+                ids.discard(son['_id'])
+
+    def _flush(self):
+        """Hook for persisting the changes made to the store, called once every write finishes.
+        """
+        pass
+
+
+@lru_cache(maxsize=None)
+def indexed_fields(model_cls):
+    """Returns the database fields of a model whose values are indexed by the repository, which are its
+    references and the leading fields of its unique indexes.
+
+    :param model_cls: A model class
+    :type model_cls: mongoengine.Document
+    :return: The names of the indexed database fields
+    :rtype: tuple
+    """
+    db_fields = [
+        field.db_field for field in model_cls._fields.values()
+        if isinstance(field, (LazyReferenceField, ReferenceField))
+    ]
+    db_fields.extend(
+        spec['fields'][0][0] for spec in model_cls._meta.get('index_specs') or [] if spec.get('unique')
+    )
+    return tuple(dict.fromkeys(db_fields))
+
+
+def index_value(value):
+    """Returns the key a value is indexed by.
+
+    :param value: A document value
+    :type value: object
+    :return: The value itself, or its representation if it can't be hashed
+    :rtype: object
+    """
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def unique_index_keys(model_cls, son):
+    """Returns the keys of a document for each unique index of its model.
+
+    :param model_cls: A model class
+    :type model_cls: mongoengine.Document
+    :param son: A stored document
+    :type son: dict
+    :return: A list of (index, values) tuples, where values holds the document values for the index fields
+    :rtype: list
+    """
+    return [
+        (position, tuple(repr(get_path(son, field, None)) for field, _ in spec['fields']))
+        for position, spec in enumerate(model_cls._meta.get('index_specs') or [])
+        if spec.get('unique')
+    ]
+
+
+def is_operator(condition):
+    """Indicates whether a filter condition is made of query operators (e.g. {'$lt': 3}).
+
+    :param condition: A filter condition
+    :type condition: object
+    :return: True if the condition holds query operators, False otherwise
+    :rtype: bool
+    """
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith('$') for key in condition)
+
+
+def match(son, query):
+    """Indicates whether a document matches a MongoDB filter document.
+
+    :param son: A stored document
+    :type son: dict
+    :param query: A MongoDB filter document
+    :type query: dict
+    :return: True if the document matches the filter, False otherwise
+    :rtype: bool
+    """
+    for path, condition in query.items():
+        if path == '$or':
+            if not any(match(son, sub_query) for sub_query in condition):
+                return False
+        elif path == '$and':
+            if not all(match(son, sub_query) for sub_query in condition):
+                return False
+        elif is_operator(condition):
+            value = get_path(son, path)
+            if not all(compare(operator, value, operand) for operator, operand in condition.items()):
+                return False
+        elif get_path(son, path, None) != condition:
+            return False
+    return True
+
+
+def compare(operator, value, operand):
+    """Evaluates a MongoDB query operator on a document value.
+
+    :param operator: A query operator (e.g. '$lt')
+    :type operator: string
+    :param value: A document value, or MISSING if the document has no such value
+    :type value: object
+    :param operand: The operand of the query operator
+    :type operand: object
+    :return: True if the value satisfies the operator, False otherwise
+    :rtype: bool
+    """
+    if operator == '$ne':
+        return (None if value is MISSING else value) != operand
+    if operator == '$in':
+        return (None if value is MISSING else value) in operand
+    if operator == '$exists':
+        return (value is not MISSING) == bool(operand)
+    if value is MISSING or value is None:
+        return False
+    try:
+        if operator == '$lt':
+            return value < operand
+        if operator == '$lte':
+            return value <= operand
+        if operator == '$gt':
+            return value > operand
+        if operator == '$gte':
+            return value >= operand
+    except TypeError:
+        return False
+    raise ValueError(f'Unsupported query operator {operator}')
+
+
+def apply_update(son, update):
+    """Applies a MongoDB update document to a document, in place.
+
+    :param son: A stored document
+    :type son: dict
+    :param update: A MongoDB update document
+    :type update: dict
+    """
+    for operator, values in update.items():
+        for path, operand in values.items():
+            current = get_path(son, path)
+            if operator == '$set':
+                value = operand
+            elif operator == '$inc':
+                value = (0 if current is MISSING else current) + operand
+            elif operator == '$min':
+                value = operand if current in (MISSING, None) or operand < current else current
+            elif operator == '$max':
+                value = operand if current in (MISSING, None) or operand > current else current
+            else:
+                raise ValueError(f'Unsupported update operator {operator}')
+            set_path(son, path, deepcopy(value))
+
+
+def get_path(son, path, default=MISSING):
+    """Returns the value at a dotted path of a document.
+
+    :param son: A stored document
+    :type son: dict
+    :param path: A dotted path (e.g. 'board.cells.3')
+    :type path: string
+    :param default: The value to be returned when the path is missing
+    :type default: object
+    :return: The value at the path
+    :rtype: object
+    """
+    value = son
+    for key in path.split('.'):
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return default
+    return value
+
+
+def set_path(son, path, value):
+    """Sets the value at a dotted path of a document, creating the missing embedded documents.
+
+    :param son: A stored document
+    :type son: dict
+    :param path: A dotted path (e.g. 'board.cells.3')
+    :type path: string
+    :param value: The value to be set
+    :type value: object
+    """
+    *keys, last = path.split('.')
+    target = son
+    for key in keys:
+        target = target[int(key)] if isinstance(target, list) else target.setdefault(key, {})
+
+    if isinstance(target, list):
+        index = int(last)
+        target.extend([None] * (index + 1 - len(target)))
+        target[index] = value
+    else:
+        target[last] = value
+
+
+def sort_key(value):
+    """Returns a key for sorting documents by a value, placing missing values first.
+
+    :param value: A document value, or MISSING if the document has no such value
+    :type value: object
+    :return: A sorting key
+    :rtype: tuple
+    """
+    return (0, 0) if value is MISSING or value is None else (1, value)
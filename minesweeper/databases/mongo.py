@@ -1,17 +1,170 @@
-from mongoengine import connect
+from mongoengine import (
+    connect,
+    disconnect,
+    NotUniqueError,
+)
+from mongoengine.connection import get_connection
+from pymongo import UpdateOne
+from pymongo.errors import (
+    BulkWriteError,
+    DuplicateKeyError,
+)
 
+from .base import BaseRepository
 from minesweeper.config import config
+from minesweeper.models.event import GameEventModel
+from minesweeper.models.game import GameModel
+from minesweeper.models.tile import TileModel
+from minesweeper.models.user import UserModel
+
+
+# Error code reported by MongoDB when a write violates a unique index
+DUPLICATE_KEY_ERROR = 11000
 
 
 def connect_to_mongo_db():
-    """
+    """Sets up the connection pool to the application database.
+
+    .note: No connection is opened until the database is first used (see `warm_up_mongo_db`), so that pools
+    are never shared by processes forked afterwards.
     """
     db_config = config['database']
+    pool_config = db_config.get('pool') or {}
     connect(
         db=db_config['name'],
         host=db_config['host'],
         port=db_config['port'],
         username=db_config['username'],
         password=db_config['password'],
-        authentication_source='admin'
+        authentication_source='admin',
+        connect=False,
+        maxPoolSize=pool_config.get('max_size', 100),
+        minPoolSize=pool_config.get('min_size', 0),
+        connectTimeoutMS=pool_config.get('connect_timeout_ms', 20000),
+        socketTimeoutMS=pool_config.get('socket_timeout_ms'),
+        serverSelectionTimeoutMS=pool_config.get('server_selection_timeout_ms', 30000),
+        waitQueueTimeoutMS=pool_config.get('wait_queue_timeout_ms'),
+        readPreference=db_config.get('read_preference', 'primary'),
     )
+
+
+def disconnect_from_mongo_db():
+    """Closes the connection pool to the application database.
+    """
+    disconnect()
+
+
+def warm_up_mongo_db():
+    """Opens a first connection to the application database, so that requests don't wait for it.
+
+    .note: The pool keeps at least `database.pool.min_size` connections open from then on.
+    """
+    get_connection().admin.command('ping')
+
+
+def ensure_mongo_db_indexes():
+    """Creates the indexes declared by the application models, unless they already exist.
+
+    .note: Models don't create their indexes lazily on first use, so this needs to be called once at startup.
+    """
+    for model_cls in (UserModel, GameModel, GameEventModel, TileModel):
+        model_cls.ensure_indexes()
+
+
+class MongoRepository(BaseRepository):
+    """Repository storing the application models in a MongoDB database.
+    """
+
+    def connect(self):
+        """Overwrites BaseRepository.connect.
+        """
+        connect_to_mongo_db()
+
+    def disconnect(self):
+        """Overwrites BaseRepository.disconnect.
+        """
+        disconnect_from_mongo_db()
+
+    def warm_up(self):
+        """Overwrites BaseRepository.warm_up.
+        """
+        warm_up_mongo_db()
+
+    def ensure_indexes(self):
+        """Overwrites BaseRepository.ensure_indexes.
+        """
+        ensure_mongo_db_indexes()
+
+    def get(self, model_cls, identifier, only=None):
+        """Overwrites BaseRepository.get.
+        """
+        queryset = model_cls.objects.only(*only) if only else model_cls.objects
+        return queryset.with_id(identifier)
+
+    def find(self, model_cls, query=None, sort=None, limit=None, only=None):
+        """Overwrites BaseRepository.find.
+        """
+        projection = {model_cls._fields[name].db_field: True for name in only} if only else None
+        cursor = model_cls._get_collection().find(query or {}, projection, sort=sort, limit=limit or 0)
+        return (model_cls._from_son(son) for son in cursor)
+
+    def save(self, document):
+        """Overwrites BaseRepository.save.
+        """
+        document.save()
+
+    def insert(self, document):
+        """Overwrites BaseRepository.insert.
+        """
+        document.save(force_insert=True)
+
+    def insert_all(self, documents):
+        """Overwrites BaseRepository.insert_all.
+        """
+        if not documents:
+            return
+
+        for document in documents:
+            document.validate()
+
+        try:
+            result = documents[0]._get_collection().insert_many([document.to_mongo() for document in documents])
+        except BulkWriteError as err:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in err.details['writeErrors']):
+                raise
+            raise NotUniqueError(str(err))
+
+        for document, identifier in zip(documents, result.inserted_ids):
+            document.id = identifier
+            document._clear_changed_fields()
+            document._created = False
+
+    def update(self, model_cls, query, update, upsert=False):
+        """Overwrites BaseRepository.update.
+        """
+        try:
+            result = model_cls._get_collection().update_one(query, update, upsert=upsert)
+        except DuplicateKeyError as err:
+            raise NotUniqueError(str(err))
+        return bool(result.matched_count or result.upserted_id)
+
+    def update_all(self, model_cls, updates, upsert=False):
+        """Overwrites BaseRepository.update_all.
+        """
+        if not updates:
+            return
+
+        try:
+            model_cls._get_collection().bulk_write(
+                [UpdateOne(query, update, upsert=upsert) for query, update in updates],
+                ordered=False,
+            )
+        except BulkWriteError as err:
+            if any(error['code'] != DUPLICATE_KEY_ERROR for error in err.details['writeErrors']):
+                raise
+            raise NotUniqueError(str(err))
+
+    def delete(self, document):
+        """Overwrites BaseRepository.delete.
+        """
+        document.delete()
@@ -0,0 +1,104 @@
+import sqlite3
+
+import bson
+
+from .memory import MemoryRepository
+
+
+class SQLiteRepository(MemoryRepository):
+    """Repository storing the application models in a SQLite database file.
+
+    Stored documents are BSON-encoded into a single `documents` table. The whole table is loaded into memory on
+    connection, so that queries are served as in `MemoryRepository`, and every write goes through to the file
+    before returning.
+
+    .note: The file is only read on connection, so it must not be shared by several processes at the same time.
+    """
+
+    def __init__(self, path):
+        """Creates a repository for a SQLite database file.
+
+        :param path: The path to the database file
+        :type path: string
+        """
+        super().__init__()
+        self.path = path
+        self._connection = None
+        self._pending = {}
+
+    def connect(self):
+        """Overwrites BaseRepository.connect.
+        """
+        with self._lock:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS documents ('
+                'collection TEXT NOT NULL, id BLOB NOT NULL, data BLOB NOT NULL, PRIMARY KEY (collection, id))'
+            )
+            self._connection.commit()
+
+            self._collections = {}
+            self._pending = {}
+            for collection, data in self._connection.execute('SELECT collection, data FROM documents'):
+                son = bson.decode(data)
+                self._collections.setdefault(collection, {})[son['_id']] = son
+            self._index_documents()
+
+    def disconnect(self):
+        """Overwrites BaseRepository.disconnect.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _index_documents(self):
+        """Rebuilds the unique keys and field indexes of the loaded documents, without writing them back to the file.
+
+        .note: Unique keys are only tracked in memory, so they are rebuilt on every connection instead of being
+        created by `ensure_indexes`.
+        """
+        # Imported here as the application models depend on the repository module
+        from minesweeper.models.event import GameEventModel
+        from minesweeper.models.game import GameModel
+        from minesweeper.models.tile import TileModel
+        from minesweeper.models.user import UserModel
+
+        with self._lock:
+            self._unique_keys = {}
+            self._field_indexes = {}
+            for model_cls in (UserModel, GameModel, GameEventModel, TileModel):
+                for son in list(self._collection(model_cls).values()):
+                    super()._store(model_cls, son)
+
+    def _store(self, model_cls, son):
+        """Overwrites MemoryRepository._store to queue the document for being written to the file.
+        """
+        super()._store(model_cls, son)
+        self._pending[(model_cls._get_collection_name(), son['_id'])] = son
+
+    def _discard(self, model_cls, identifier):
+        """Overwrites MemoryRepository._discard to queue the document for being removed from the file.
+        """
+        super()._discard(model_cls, identifier)
+        self._pending[(model_cls._get_collection_name(), identifier)] = None
+
+    def _flush(self):
+        """Overwrites MemoryRepository._flush to write the queued changes to the file in a single transaction.
+        """
+        if not self._pending:
+            return
+
+        with self._connection:
+            for (collection, identifier), son in self._pending.items():
+                if son is None:
+                    self._connection.execute(
+                        'DELETE FROM documents WHERE collection = ? AND id = ?',
+                        (collection, identifier.binary),
+                    )
+                else:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)',
+                        (collection, identifier.binary, bson.encode(son)),
+                    )
+        self._pending = {}
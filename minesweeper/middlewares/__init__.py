@@ -1,4 +1,5 @@
 from falcon import (
+    HTTPConflict,
     HTTPError,
     HTTPInternalServerError
 )
@@ -23,3 +24,19 @@ def internal_error_handler(ex, req, resp, params):
         raise HTTPInternalServerError(description=repr(ex))
     else:
         raise ex
+
+
+def conflict_error_handler(ex, req, resp, params):
+    """Whenever a resource is changed by someone else while a request was updating it, it wraps the raised
+    exception into a falcon.HTTPConflict exception, so that clients know they can retry the request.
+
+    :param ex: The exception caught
+    :type ex: minesweeper.common.exceptions.GameConflictException
+    :param req: The falcon request object
+    :type req: falcon.Request
+    :param resp: The falcon response object
+    :type resp: falcon.Response
+    :param params: Additional requests parameters
+    :type params: dict
+    """
+    raise HTTPConflict(title='Conflict', description=str(ex))
@@ -1,5 +1,7 @@
 import falcon
 
+from minesweeper.common.media import NDJSON_MEDIA_TYPE
+
 
 class RequireJSONMiddleware(object):
     """Middleware class that checks for 'application/json' media-type required headers in
@@ -7,7 +9,7 @@ class RequireJSONMiddleware(object):
     """
 
     def process_request(self, req, resp):
-        if not req.client_accepts_json:
+        if not req.client_accepts_json and not req.client_accepts(NDJSON_MEDIA_TYPE):
             raise falcon.HTTPNotAcceptable('This API only supports responses encoded as JSON.')
 
         if req.method in ('POST', 'PUT', 'PATCH', 'DELETE'):
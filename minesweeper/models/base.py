@@ -3,6 +3,8 @@ from datetime import datetime
 from mongoengine import signals
 from mongoengine.fields import DateTimeField
 
+from minesweeper.databases.base import get_repository
+
 
 class BaseModel(object):
     """Base resource database model class.
@@ -18,17 +20,35 @@ class BaseModel(object):
         document.updated = datetime.utcnow()
 
     @classmethod
-    def get_by_id(cls, identifier):
+    def get_by_id(cls, identifier, only=None):
         """Gets a model instance matching the given id, or returns None otherwise.
 
         :param cls: A resource model class
         :type cls: minsweeper.models.BaseModel
         :param identifier: The id of the instance to be searched
         :type identifier: string
+        :param only: The names of the only fields to be loaded, or None to load all of them
+        :type only: tuple | NoneType
         :return: A model class instance or None
         :rtype: minsweeper.models.BaseModel | None
         """
-        return cls.objects.with_id(identifier)
+        return get_repository().get(cls, identifier, only=only)
+
+    @classmethod
+    def bring_up_to_date(cls, instances):
+        """Brings a batch of model instances retrieved from the repository up to date.
+
+        .note: This method can be overwritten by especific model classes whose stored instances may lag behind
+        their actual state.
+
+        :param cls: A resource model class
+        :type cls: minsweeper.models.BaseModel
+        :param instances: A list of model instances
+        :type instances: list
+        :return: The up to date model instances, in the same order
+        :rtype: list
+        """
+        return instances
 
 
 signals.pre_save.connect(BaseModel.pre_save, sender=BaseModel)
@@ -0,0 +1,572 @@
+import json
+from random import getrandbits
+
+import numpy
+from scipy import ndimage
+
+from mongoengine import (
+    EmbeddedDocument,
+    ValidationError,
+)
+from mongoengine.fields import (
+    BooleanField,
+    IntField,
+)
+
+from .fields import ByteGridField
+from minesweeper.config import config
+
+
+# Bit masks for the state of a cell within the `BoardModel.cells` grid
+CELL_MINE = 0x01
+CELL_FLAGGED = 0x02
+CELL_OPENED = 0x04
+
+# The number of mines surrounding a cell is kept in the upper bits of its state
+CELL_VALUE_SHIFT = 4
+
+# Number of cells stored in each chunk of the `BoardModel.cells` grid
+CELLS_CHUNK_SIZE = 256
+
+# Structuring element connecting each cell with its 8 neighbours
+NEIGHBOURHOOD = numpy.ones((3, 3), dtype=bool)
+
+
+class BoardModel(EmbeddedDocument):
+    """Database model for the board of a GameResource
+
+    The state of every cell is packed into a single byte of the `cells` grid (see the `CELL_*` bit masks),
+    which is stored in row-major order as a list of BSON binary chunks. Cells are addressed by (row, column)
+    tuples, and the `mines`, `flagged` and `opened` properties translate that grid back into lists of cell
+    coordinates.
+
+    Actions keep track of the chunks of cells they change, so that `pending_changes` can tell the game which
+    parts of the board need to be written back to the database.
+
+    .note: Boards stored before the `cells` grid existed hold their cells as `mines`, `flagged` and `opened` lists
+    of coordinate strings instead. They are converted into the grid when loaded, and stored as such by the next
+    snapshot of their game.
+    """
+    meta = {'allow_inheritance': True, 'strict': False}
+
+    mode = 'standard'
+
+    # Fields (besides the `cells` grid) that may be changed by the actions on the board
+    action_fields = ('seed', 'generated', 'nbr_opened')
+
+    # Fields holding the cells of the boards stored before the `cells` grid existed
+    legacy_fields = ('mines', 'flagged', 'opened')
+
+    nbr_rows = IntField(min_value=2,)
+    nbr_columns = IntField(min_value=2)
+    nbr_mines = IntField(min_value=1)
+    seed = IntField(min_value=0)
+    cells = ByteGridField(chunk_size=CELLS_CHUNK_SIZE)
+    generated = BooleanField(default=False)
+    nbr_opened = IntField(min_value=0, default=0)
+
+    def __init__(self, *args, **kwargs):
+        legacy_cells = {name: kwargs.pop(name) for name in self.legacy_fields if name in kwargs}
+        super().__init__(*args, **kwargs)
+        self._changed_chunks = set()
+        if legacy_cells and self.cells is None:
+            self._convert_legacy_cells(**legacy_cells)
+
+    def clean(self):
+        """Validates the board dimensions and allocates its cells.
+
+        .note: This hook only runs when the board gets validated before being saved, so loading a board
+        from the database doesn't pay for it.
+        """
+        max_rows = config['app']['game'].get('max_rows', 99)
+        max_columns = config['app']['game'].get('max_columns', 99)
+
+        # Check nbr_rows is in range
+        if not 2 <= self.nbr_rows <= max_rows:
+            raise ValidationError(f'Number of rows exceeds the maximum of {max_rows}')
+
+        # Check nbr_columns is in range
+        if not 2 <= self.nbr_columns <= max_columns:
+            raise ValidationError(f'Number of columns exceeds the maximum of {max_columns}')
+
+        # Check nbr_mines is in range, leaving at least one cell free of mines
+        max_mines = min(config['app']['game'].get('max_mines') or self.nbr_cells, self.nbr_cells - 1)
+        if not 1 <= self.nbr_mines <= max_mines:
+            raise ValidationError(f'Number of mines exceeds the maximum of {max_mines}')
+
+        # Pick the seed up front, so that replaying the game actions always places the same mines
+        if self.seed is None:
+            self.seed = getrandbits(32)
+
+        # Allocate board cells, mines are placed once the first cell gets opened
+        if self.cells is None:
+            self.cells = bytearray(self.nbr_cells)
+
+    @property
+    def nbr_cells(self):
+        """Returns the number of cells in the board.
+
+        :return: The number of cells in the board
+        :rtype: int
+        """
+        return self.nbr_rows * self.nbr_columns
+
+    @property
+    def large(self):
+        """Returns True when the board is large enough for its regions to be revealed with vectorized operations.
+
+        :return: True if the board is large, False otherwise
+        :rtype: bool
+        """
+        return self.nbr_cells >= config['app']['game'].get('vectorized_open_min_cells', 10000)
+
+    @property
+    def nbr_chunks(self):
+        """Returns the number of chunks the `cells` grid is stored in.
+
+        :return: The number of chunks of the `cells` grid
+        :rtype: int
+        """
+        return -(-self.nbr_cells // CELLS_CHUNK_SIZE)
+
+    def place_mines(self, index):
+        """Places the board mines on random cells, and counts the mines surrounding each cell.
+
+        Mines are kept away from the given cell, and also from its neighbours as long as the board has
+        enough room left for all of its mines.
+
+        .note: Mines positions only depend on the board `seed` and on the given cell. The seed is randomly
+        chosen unless it was already given, so boards can be reproduced.
+
+        :param index: The index in the `cells` grid of the first cell opened in the board
+        :type index: int
+        """
+        if self.seed is None:
+            self.seed = getrandbits(32)
+
+        # Find out which cells must be kept free of mines
+        safe_cells = sorted([index] + self._neighbour_indexes(index))
+        if self.nbr_cells - len(safe_cells) < self.nbr_mines:
+            safe_cells = [index]
+
+        # Sample mines positions without replacement among the remaining cells
+        rng = numpy.random.default_rng(self.seed)
+        mines = rng.choice(self.nbr_cells - len(safe_cells), self.nbr_mines, replace=False)
+        for safe_cell in safe_cells:
+            mines[mines >= safe_cell] += 1
+
+        grid = numpy.zeros((self.nbr_rows, self.nbr_columns), dtype=numpy.uint8)
+        grid.flat[mines] = CELL_MINE
+        self._count_mines(grid)
+
+        # Keep the flags that were set before mines were placed
+        grid |= numpy.frombuffer(self.cells, dtype=numpy.uint8).reshape(grid.shape) & CELL_FLAGGED
+
+        self.cells = bytearray(grid.tobytes())
+        self.generated = True
+        self._changed_chunks.update(range(self.nbr_chunks))
+
+    @property
+    def mines(self):
+        """Returns the list of cells that hold a mine.
+
+        :return: The (row, column) coordinates of the mined cells
+        :rtype: list
+        """
+        return [self._cell_coordinates(index) for index, state in enumerate(self.cells) if state & CELL_MINE]
+
+    @property
+    def flagged(self):
+        """Returns the list of cells that are flagged.
+
+        :return: The (row, column) coordinates of the flagged cells
+        :rtype: list
+        """
+        return [self._cell_coordinates(index) for index, state in enumerate(self.cells) if state & CELL_FLAGGED]
+
+    @property
+    def opened(self):
+        """Returns the list of cells that are opened along with their values.
+
+        :return: The (row, column, value) tuples of the opened cells
+        :rtype: list
+        """
+        return [
+            (*self._cell_coordinates(index), self._state_value(state))
+            for index, state in enumerate(self.cells) if state & CELL_OPENED
+        ]
+
+    def flag(self, cell):
+        """Toggles a board cell as flagged/unflagged.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        """
+        index = self._cell_index(cell)
+        if self.cells[index] & CELL_FLAGGED:
+            self.cells[index] &= ~CELL_FLAGGED
+        elif not self.cells[index] & CELL_OPENED:
+            self.cells[index] |= CELL_FLAGGED
+        self._changed_chunks.add(index // CELLS_CHUNK_SIZE)
+        self._mark_as_changed('cells')
+
+    def open(self, cell):
+        """Reveals a board cell and its surroundings.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The status the game moves to because of the revealed cells ('lost' when a mine explodes or
+        'won' when all the cells free of mines are opened), or None if the game goes on
+        :rtype: string | NoneType
+        """
+        index = self._cell_index(cell)
+
+        # If cell can't be opened, return
+        if self.cells[index] & (CELL_FLAGGED | CELL_OPENED):
+            return None
+
+        # Place the mines on the first cell opening, so that it never explodes
+        if not self.generated:
+            self.place_mines(index)
+
+        # Mark cell as opened
+        state = self.cells[index]
+        self._open_index(index)
+
+        # And if the cell didn't explode then...
+        if not state & CELL_MINE:
+            # Find neighbours that also need to be opened
+            if self.large:
+                self._open_region(index)
+            else:
+                self._open_neighbours(index)
+
+        self._mark_as_changed('cells')
+
+        return self._outcome(state)
+
+    def chord(self, cell):
+        """Reveals the remaining neighbours of an opened cell, as long as it has as many flagged neighbours as
+        surrounding mines.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The status the game moves to because of the revealed cells ('lost' when a mine explodes or
+        'won' when all the cells free of mines are opened), or None if the game goes on
+        :rtype: string | NoneType
+        """
+        if not self.is_chordable(cell):
+            return None
+
+        outcome = None
+        for neighbour in self.neighbours(cell):
+            if not self.is_open(neighbour) and not self.is_flagged(neighbour):
+                outcome = self.open(neighbour)
+                if outcome == 'lost':
+                    break
+
+        return outcome
+
+    def is_chordable(self, cell):
+        """Indicates whether a cell is opened and has as many flagged neighbours as surrounding mines.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the remaining neighbours of the cell can be revealed at once, False otherwise
+        :rtype: bool
+        """
+        if not self.is_open(cell) or self.is_mine(cell):
+            return False
+        return sum(self.is_flagged(neighbour) for neighbour in self.neighbours(cell)) == self.value(cell)
+
+    def pending_changes(self):
+        """Returns the board values changed by the actions performed since the changes were last cleared.
+
+        .note: Changes are kept until `clear_changes` is called, so that they can be written again if storing
+        them fails.
+
+        :return: The changed values in their database representation, keyed by their path within the board (a
+        changed chunk of cells is keyed as 'cells.<chunk>')
+        :rtype: dict
+        """
+        changes = {
+            name: self._fields[name].to_mongo(getattr(self, name))
+            for name in self.action_fields if getattr(self, name) is not None
+        }
+
+        # Send the whole grid when all of its chunks changed
+        cells_field = self._fields['cells']
+        if self._changed_chunks and len(self._changed_chunks) == self.nbr_chunks:
+            changes['cells'] = cells_field.to_mongo(self.cells)
+        else:
+            for chunk in sorted(self._changed_chunks):
+                changes[f'cells.{chunk}'] = cells_field.to_mongo_chunk(self.cells, chunk)
+
+        return changes
+
+    def clear_changes(self):
+        """Forgets the board values changed so far, once they have been stored.
+        """
+        self._changed_chunks.clear()
+
+    def checkpoint(self):
+        """Captures the current state of the board cells, so that the cells changed afterwards can be found.
+
+        :return: An opaque checkpoint, to be given to `changed_cells`
+        :rtype: object
+        """
+        return bytes(self.cells)
+
+    def changed_cells(self, checkpoint):
+        """Returns the cells whose state changed since a checkpoint was captured.
+
+        :param checkpoint: A checkpoint, as returned by `checkpoint`
+        :type checkpoint: object
+        :return: The (row, column, previous state, current state) tuples of the changed cells, with states as in
+        the `cells` grid
+        :rtype: list
+        """
+        before = numpy.frombuffer(checkpoint, dtype=numpy.uint8)
+        after = numpy.frombuffer(bytes(self.cells), dtype=numpy.uint8)
+        return [
+            (*divmod(index, self.nbr_columns), int(before[index]), int(after[index]))
+            for index in numpy.flatnonzero(before != after).tolist()
+        ]
+
+    def is_cell(self, cell):
+        """Indicates whether a cell is inside the board or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is within the board, False otherwise
+        :rtype: bool
+        """
+        row, col = cell
+        return 0 <= row < self.nbr_rows and 0 <= col < self.nbr_columns
+
+    def is_mine(self, cell):
+        """Indicates whether a cell is a mine or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is a mine, False otherwise
+        :rtype: bool
+        """
+        return bool(self.cells[self._cell_index(cell)] & CELL_MINE)
+
+    def is_flagged(self, cell):
+        """Indicates whether a cell is flagged or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is flagged, False otherwise
+        :rtype: bool
+        """
+        return bool(self.cells[self._cell_index(cell)] & CELL_FLAGGED)
+
+    def is_open(self, cell):
+        """Indicates whether a cell is opened or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is opened, False otherwise
+        :rtype: bool
+        """
+        return bool(self.cells[self._cell_index(cell)] & CELL_OPENED)
+
+    def value(self, cell):
+        """Indicates the number of mines surrounding the cell.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The number of mines surrounding the cell
+        :rtype: int
+        """
+        return self._state_value(self.cells[self._cell_index(cell)])
+
+    def neighbours(self, cell):
+        """Returns the list of cells that are neighbours of the given cell.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The list of cells that are neighbours of the given cell
+        :rtype: list
+        """
+        row, column = cell
+        prev_row, next_row = max(0, row - 1), min(self.nbr_rows - 1, row + 1)
+        prev_col, next_col = max(0, column - 1), min(self.nbr_columns - 1, column + 1)
+
+        neighbours = set((
+            (prev_row, column),     # top
+            (prev_row, next_col),   # top_right
+            (row, next_col),        # right
+            (next_row, next_col),   # bottom_right
+            (next_row, column),     # bottom
+            (next_row, prev_col),   # bottom_left
+            (row, prev_col),        # left
+            (prev_row, prev_col),   # top_left
+        ))
+
+        if cell in neighbours:
+            neighbours.remove(cell)
+
+        return sorted(list(neighbours))
+
+    def _outcome(self, state):
+        """Tells whether the game was either lost or won after opening a cell.
+
+        :param state: The state the opened cell had before being opened
+        :type state: int
+        :return: 'lost' if the opened cell was a mine, 'won' if all the cells free of mines are opened, or
+        None otherwise
+        :rtype: string | NoneType
+        """
+        if state & CELL_MINE:
+            return 'lost'
+        elif self.nbr_opened + self.nbr_mines == self.nbr_cells:
+            return 'won'
+        return None
+
+    def _open_neighbours(self, index):
+        """Reveals the neighbours of an opened cell, spreading through the cells that have no surrounding mines.
+
+        :param index: The index of an opened cell in the `cells` grid
+        :type index: int
+        """
+        # Visit each cell at most once
+        pending = [n for n in self._neighbour_indexes(index) if not self.cells[n] & CELL_OPENED]
+        while pending:
+            neighbour = pending.pop()
+            state = self.cells[neighbour]
+            if not state & (CELL_MINE | CELL_OPENED):
+                self._open_index(neighbour)
+                if not state >> CELL_VALUE_SHIFT:
+                    pending.extend(n for n in self._neighbour_indexes(neighbour) if not self.cells[n] & CELL_OPENED)
+
+    def _open_region(self, index):
+        """Vectorized version of `_open_neighbours`, meant for large boards.
+
+        The cells with no surrounding mines are labelled into connected regions, and every region reached from
+        the neighbours of the opened cell is revealed at once along with its border.
+
+        :param index: The index of an opened cell in the `cells` grid
+        :type index: int
+        """
+        grid = numpy.frombuffer(self.cells, dtype=numpy.uint8).reshape(self.nbr_rows, self.nbr_columns)
+        row, column = self._cell_coordinates(index)
+
+        # Find the cells that can still be opened, and the ones among them that spread the reveal
+        closed = (grid & (CELL_MINE | CELL_OPENED)) == 0
+        empty = closed & ((grid >> CELL_VALUE_SHIFT) == 0)
+
+        # Neighbours of the opened cell are always revealed
+        region = numpy.zeros(grid.shape, dtype=bool)
+        region[max(0, row - 1):row + 2, max(0, column - 1):column + 2] = True
+        region &= closed
+
+        # Along with the empty regions they belong to and their borders
+        labels, nbr_labels = ndimage.label(empty, structure=NEIGHBOURHOOD)
+        reached = numpy.zeros(nbr_labels + 1, dtype=bool)
+        reached[labels[region]] = True
+        reached[0] = False
+        region |= ndimage.binary_dilation(reached[labels], structure=NEIGHBOURHOOD) & closed
+
+        grid[region] |= CELL_OPENED
+        self.nbr_opened += int(numpy.count_nonzero(region))
+        self._changed_chunks.update(numpy.unique(numpy.flatnonzero(region) // CELLS_CHUNK_SIZE).tolist())
+
+    def _open_index(self, index):
+        """Marks the cell at the given position of the `cells` grid as opened.
+
+        :param index: The index of a cell in the `cells` grid
+        :type index: int
+        """
+        self.nbr_opened += 1
+        self.cells[index] |= CELL_OPENED
+        self._changed_chunks.add(index // CELLS_CHUNK_SIZE)
+
+    def _neighbour_indexes(self, index):
+        """Returns the positions within the `cells` grid of the neighbours of the given cell.
+
+        :param index: The index of a cell in the `cells` grid
+        :type index: int
+        :return: The indexes of the neighbour cells in the `cells` grid
+        :rtype: list
+        """
+        row, column = divmod(index, self.nbr_columns)
+        return [
+            r * self.nbr_columns + c
+            for r in range(max(0, row - 1), min(self.nbr_rows, row + 2))
+            for c in range(max(0, column - 1), min(self.nbr_columns, column + 2))
+            if r != row or c != column
+        ]
+
+    def _convert_legacy_cells(self, mines=(), flagged=(), opened=()):
+        """Builds the `cells` grid out of the cell lists of a board stored before the grid existed.
+
+        :param mines: The '[row, column]' coordinates of the mined cells
+        :type mines: list
+        :param flagged: The '[row, column]' coordinates of the flagged cells
+        :type flagged: list
+        :param opened: The '[row, column, value]' coordinates of the opened cells
+        :type opened: list
+        """
+        grid = numpy.zeros((self.nbr_rows, self.nbr_columns), dtype=numpy.uint8)
+        for cell in mines:
+            grid[tuple(json.loads(cell))] = CELL_MINE
+        self._count_mines(grid)
+
+        for cell in flagged:
+            grid[tuple(json.loads(cell))] |= CELL_FLAGGED
+        for cell in opened:
+            grid[tuple(json.loads(cell)[:2])] |= CELL_OPENED
+
+        # Mines were placed as soon as legacy boards were created
+        self.cells = bytearray(grid.tobytes())
+        self.generated = bool(mines)
+        self.nbr_opened = int(numpy.count_nonzero(grid & CELL_OPENED))
+
+        # The whole grid must be written by the next snapshot, as the stored board has none
+        self._changed_chunks.update(range(self.nbr_chunks))
+
+    @staticmethod
+    def _count_mines(grid):
+        """Counts the mines surrounding each cell of a grid all at once, and stores them within the cells state.
+
+        :param grid: A 2D array of cell states, with the mines already placed
+        :type grid: numpy.ndarray
+        """
+        counts = ndimage.convolve(grid & CELL_MINE, NEIGHBOURHOOD.astype(numpy.uint8), mode='constant')
+        grid |= (counts - (grid & CELL_MINE)) << CELL_VALUE_SHIFT
+
+    @staticmethod
+    def _state_value(state):
+        """Returns the value of a cell out of its state in the `cells` grid.
+
+        :param state: The state of a cell in the `cells` grid
+        :type state: int
+        :return: The number of mines surrounding the cell, or -1 if the cell is a mine
+        :rtype: int
+        """
+        return -1 if state & CELL_MINE else state >> CELL_VALUE_SHIFT
+
+    def _cell_index(self, cell):
+        """Returns the position of a cell within the `cells` grid.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The index of the cell in the `cells` grid
+        :rtype: int
+        """
+        row, column = cell
+        return row * self.nbr_columns + column
+
+    def _cell_coordinates(self, index):
+        """Returns the coordinates of the cell at the given position of the `cells` grid.
+
+        :param index: The index of a cell in the `cells` grid
+        :type index: int
+        :return: The (row, column) coordinates of the cell
+        :rtype: tuple
+        """
+        return divmod(index, self.nbr_columns)
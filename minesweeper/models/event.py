@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from mongoengine import Document
+from mongoengine.fields import (
+    DateTimeField,
+    IntField,
+    LazyReferenceField,
+    StringField,
+)
+
+
+class GameEventModel(Document):
+    """Database model for the actions applied to a GameResource
+
+    Events are only ever inserted. Each one bumps the version of its game, and the unique index on
+    (game, version) ensures that two concurrent actions can never record the same version of a game.
+    """
+    game = LazyReferenceField('GameModel', required=True)
+    version = IntField(required=True, min_value=1)
+    action = StringField(required=True, choices=('start', 'pause', 'flag', 'open', 'chord'))
+    cell = IntField(min_value=0)
+    created = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'indexes': [
+            {'fields': ('game', 'version'), 'unique': True},
+        ],
+        'auto_create_index': False,
+    }
+
+    def __repr__(self):
+        return f'<GameEvent {self.id} ({self.action} v{self.version})>'
+
+    def __str__(self):
+        return f'<GameEvent {self.id} ({self.action} v{self.version})>'
@@ -0,0 +1,61 @@
+from bson import Binary
+
+from mongoengine.fields import BinaryField
+
+
+class ByteGridField(BinaryField):
+    """Binary field that stores a grid of bytes (one byte per cell) as BSON binary values.
+
+    Values are handled as mutable `bytearray` objects in Python, so cells can be updated in place. When a
+    `chunk_size` is given, the grid is stored as a list of binary chunks of that size, so that single chunks can
+    be overwritten in the database (see `to_mongo_chunk`) without sending the whole grid.
+
+    .note: In-place updates are not detected by mongoengine, so the owner document is responsible for
+    calling `_mark_as_changed` on the field after mutating it.
+    """
+
+    def __init__(self, chunk_size=None, **kwargs):
+        self.chunk_size = chunk_size
+        super().__init__(**kwargs)
+
+    def __set__(self, instance, value):
+        """Keeps byte grids assigned to the field as mutable `bytearray` objects.
+        """
+        return super(BinaryField, self).__set__(instance, self.to_python(value))
+
+    def to_python(self, value):
+        """Converts a BSON binary value (or list of chunks) loaded from the database into a mutable byte grid.
+        """
+        if isinstance(value, (bytes, Binary)):
+            return bytearray(value)
+        if isinstance(value, list):
+            return bytearray(b''.join(value))
+        return value
+
+    def to_mongo(self, value):
+        """Converts a byte grid into a BSON binary value, or into a list of them when the grid is chunked.
+        """
+        if self.chunk_size is None:
+            return Binary(bytes(value))
+        return [self.to_mongo_chunk(value, chunk) for chunk in range(-(-len(value) // self.chunk_size))]
+
+    def to_mongo_chunk(self, value, chunk):
+        """Converts a single chunk of a byte grid into a BSON binary value.
+
+        :param value: A byte grid
+        :type value: bytearray
+        :param chunk: The position of the chunk within the grid
+        :type chunk: int
+        :return: The BSON binary value of the chunk
+        :rtype: bson.Binary
+        """
+        return Binary(bytes(value[chunk * self.chunk_size:(chunk + 1) * self.chunk_size]))
+
+    def validate(self, value):
+        """Validates the value is a byte grid within the field size limits.
+        """
+        if not isinstance(value, (bytes, bytearray, Binary)):
+            self.error('ByteGridField only accepts bytes-like values')
+
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            self.error('Binary value is too long')
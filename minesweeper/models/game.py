@@ -1,257 +1,131 @@
 import datetime
-from random import randint
+from threading import RLock
 
+from bson import ObjectId
 from mongoengine import (
     CASCADE,
     Document,
-    EmbeddedDocument,
+    NotUniqueError,
 )
 
-from mongoengine import (
-    signals,
-    ValidationError
-)
+from mongoengine import signals
 from mongoengine.fields import (
+    BooleanField,
     EmbeddedDocumentField,
     IntField,
-    ListField,
-    ReferenceField,
+    LazyReferenceField,
     StringField,
 )
 
 from .base import BaseModel
+from .board import BoardModel
+from .event import GameEventModel
+from .tile import (
+    TiledBoardModel,
+    TileModel,
+)
 from .user import UserModel
+from minesweeper.common.exceptions import (
+    GameConflictException,
+    MinesweeperException,
+)
 from minesweeper.config import config
+from minesweeper.databases.base import get_repository
+from minesweeper.databases.buffer import game_buffer
 
 
-class BoardModel(EmbeddedDocument):
-    """Database model for the board of a GameResource
-    """
-    nbr_rows = IntField(min_value=2,)
-    nbr_columns = IntField(min_value=2)
-    nbr_mines = IntField(min_value=1)
-    mines = ListField(StringField(min_length=6), default=[])
-    flagged = ListField(StringField(min_length=6), default=[])
-    opened = ListField(StringField(min_length=9), default=[])
-
-    @classmethod
-    def post_init(cls, sender, document, **kwargs):
-        """Post-init hook to validate and update some dependant fields.
-        """
-        max_rows = config['app']['game'].get('max_rows', 99)
-        max_columns = config['app']['game'].get('max_columns', 99)
-        max_mines = config['app']['game'].get('max_columns', 99)
-
-        # Check nbr_rows is in range
-        if not 2 <= document.nbr_rows <= max_rows:
-            raise ValidationError(f'Number of rows exceeds the maximum of {max_rows}')
-
-        # Check nbr_columns is in range
-        if not 2 <= document.nbr_columns <= max_columns:
-            raise ValidationError(f'Number of columns exceeds the maximum of {max_columns}')
-
-        # Check nbr_mines is in range
-        if not 2 <= document.nbr_mines <= max(max_mines, max_rows * max_columns):
-            raise ValidationError(f'Number of mines exceeds the maximum of {max_mines}')
-
-        # Generate mines positions
-        if not document.mines:
-            mines = document.nbr_mines
-            while mines:
-                mine = str([randint(0, document.nbr_rows - 1), randint(0, document.nbr_columns - 1)])
-                if mine in document.mines:
-                    continue
-                else:
-                    document.mines.append(mine)
-                    mines -= 1
-
-    @property
-    def nbr_cells(self):
-        """Returns the number of cells in the board.
+# Board models by board mode
+BOARD_MODELS = {board_cls.mode: board_cls for board_cls in (BoardModel, TiledBoardModel)}
 
-        :return: The number of cells in the board
-        :rtype: int
-        """
-        return self.nbr_rows * self.nbr_columns
-
-    def flag(self, cell):
-        """Toggles a board cell as flagged/unflagged.
 
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        """
-        if self.is_flagged(cell):
-            self.flagged.remove(cell)
-        elif not self.is_open(cell):
-            self.flagged.append(cell)
+class GameModel(BaseModel, Document):
+    """Database model for GameResource
+    """
+    player = LazyReferenceField(UserModel, reverse_delete_rule=CASCADE)
+    board = EmbeddedDocumentField(BoardModel)
+    status = StringField(choices=('new', 'started', 'paused', 'won', 'lost'), default='new')
+    elapsed_seconds = IntField(min_value=0, default=0)
+    version = IntField(min_value=0, default=0)
+    # Whether the outcome of the game was added to the stats of its player, unset for games created before
+    stats_recorded = BooleanField()
+
+    meta = {
+        'indexes': [
+            # Pages of games (see BaseResource.on_get_collection), filtered by player and/or status
+            ('player', 'id'),
+            ('status', 'id'),
+            ('player', 'status', 'id'),
+        ],
+        'auto_create_index': False,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending_events = []
+        self._snapshot_pending = False
+        self._dropped = False
+        self._snapshot_version = self.version
+        # Guards the game state, as buffered instances are shared by every request of the game
+        self._lock = RLock()
 
-    def open(self, cell):
-        """Reveals a board cell and its surroundings.
+    @classmethod
+    def get_by_id(cls, identifier, only=None):
+        """Overwrites BaseModel.get_by_id to bring the game up to date with the events recorded after its last
+        snapshot, or to return the game instance held by the write-behind buffer.
 
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if cell was opened, False otherwise
-        :rtype: bool
+        .note: Games retrieved straight from the repository reflect their last snapshot instead. Replaying events
+        requires the 'status', 'elapsed_seconds', 'updated', 'version' and 'board' fields to be loaded.
         """
-        # If cell can't be opened, return
-        if self.is_flagged(cell) or self.is_open(cell):
-            return False
+        game = game_buffer.get(identifier)
+        if game is None:
+            game = super().get_by_id(identifier, only=only)
+            if game is not None:
+                game.replay()
+        return game
 
-        # Otherwise
-        else:
-            # Add cell to the list of opened cells
-            self.opened.append(str(eval(cell) + [self.value(cell)]))
-
-            # And if the cell didn't explode then...
-            if not self.is_mine(cell):
-                # Find neighbours that also need to be opened
-                neighbours = set(n for n in self.neighbours(cell) if not self.is_open(n))
-                while neighbours:
-                    neighbour = neighbours.pop()
-                    if not self.is_mine(neighbour):
-                        self.opened.append(str(eval(neighbour) + [self.value(neighbour)]))
-                        if not self.value(neighbour):
-                            neighbours |= set(n for n in self.neighbours(neighbour) if not self.is_open(n))
-            return True
-
-    def is_cell(self, cell):
-        """Indicates whether a cell is inside the board or not.
-
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if the cell is within the board, False otherwise
-        :rtype: bool
-        """
-        row, col = eval(cell)
-        return 0 <= row < self.nbr_rows and 0 <= col < self.nbr_columns
-
-    def is_mine(self, cell):
-        """Indicates whether a cell is a mine or not.
-
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if the cell is a mine, False otherwise
-        :rtype: bool
+    @classmethod
+    def bring_up_to_date(cls, games):
+        """Overwrites BaseModel.bring_up_to_date to bring a batch of games up to date as `get_by_id` does, while
+        retrieving the events recorded after the last snapshot of every game with a single query.
         """
-        return cell in self.mines
+        buffered_games = [game_buffer.get(game.id) for game in games]
+        stored_games = [game for game, buffered_game in zip(games, buffered_games) if buffered_game is None]
+        if stored_games:
+            events = {game.id: [] for game in stored_games}
+            for event in get_repository().find(
+                GameEventModel,
+                {'$or': [{'game': game.id, 'version': {'$gt': game.version}} for game in stored_games]},
+                sort=[('version', 1)],
+            ):
+                events[event.game.id].append(event)
+            for game in stored_games:
+                game.replay(events[game.id])
+
+        return [buffered_game or game for game, buffered_game in zip(games, buffered_games)]
 
-    def is_flagged(self, cell):
-        """Indicates whether a cell is flagged or not.
-
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if the cell is flagged, False otherwise
-        :rtype: bool
+    @classmethod
+    def post_save(cls, sender, document, **kwargs):
+        """Post-save hook to persist the board tiles changed along with the game.
         """
-        return cell in self.flagged
+        if isinstance(document.board, TiledBoardModel):
+            document.board.save_tiles(document.version)
 
-    def is_open(self, cell):
-        """Indicates whether a cell is opened or not.
-
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if the cell is opened, False otherwise
-        :rtype: bool
+    @classmethod
+    def post_delete(cls, sender, document, **kwargs):
+        """Post-delete hook to drop the game from the write-behind buffer, along with its pending actions.
         """
-        return any(opened_cell.startswith(cell[:-1]) for opened_cell in self.opened)
+        buffered_game = game_buffer.discard(document.id)
+        if buffered_game is not None:
+            buffered_game.drop()
 
-    def value(self, cell):
-        """Indicates the number of mines surrounding the cell.
+    @property
+    def snapshot_version(self):
+        """Returns the version of the game stored by its last snapshot, as far as this instance knows.
 
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: The number of mines surrounding the cell
+        :return: The version of the last snapshot of the game
         :rtype: int
         """
-        if self.is_mine(cell):
-            return -1
-        else:
-            return sum(1 for cell in self.neighbours(cell) if self.is_mine(cell))
-
-    def neighbours(self, cell):
-        """Returns the list of cells that are neighbours of the given cell.
-
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: The list of cells that are neighbours of the given cell
-        :rtype: list
-        """
-        row, column = eval(cell)
-        prev_row, next_row = max(0, row - 1), min(self.nbr_rows - 1, row + 1)
-        prev_col, next_col = max(0, column - 1), min(self.nbr_columns - 1, column + 1)
-
-        neighbours = set((
-            f'[{prev_row}, {column}]',     # top
-            f'[{prev_row}, {next_col}]',   # top_right
-            f'[{row}, {next_col}]',        # right
-            f'[{next_row}, {next_col}]',   # bottom_right
-            f'[{next_row}, {column}]',     # bottom
-            f'[{next_row}, {prev_col}]',   # bottom_left
-            f'[{row}, {prev_col}]',        # left
-            f'[{prev_row}, {prev_col}]',   # top_left
-        ))
-
-        if cell in neighbours:
-            neighbours.remove(cell)
-
-        return sorted(list(neighbours))
-
-
-signals.post_init.connect(BoardModel.post_init, sender=BoardModel)
-
-
-class GameModel(BaseModel, Document):
-    """Database model for GameResource
-    """
-    player = ReferenceField(UserModel, reverse_delete_rule=CASCADE)
-    board = EmbeddedDocumentField(BoardModel)
-    status = StringField(choices=('new', 'started', 'paused', 'won', 'lost'), default='new')
-    elapsed_seconds = IntField(min_value=0, default=0)
-
-    @classmethod
-    def pre_save(cls, sender, document, **kwargs):
-        """Pre-save hook to validate and update certain fields before instance gets persisted.
-        """
-        # If the game is being updated, perform some validations
-        if document.id:
-            current_document = cls.get_by_id(document.id)
-
-            # If game is concluded we cannot change anything in the game
-            if current_document.status in ('won', 'lost'):
-                document = current_document
-
-            # If game is still going
-            if current_document.status == 'started':
-                # Check if player won the game
-                if len(document.board.opened) + document.board.nbr_mines == document.board.nbr_cells:
-                    document.status = 'won'
-                    document.player.stats.won += 1
-                    document.elapsed_seconds += (datetime.datetime.utcnow() - document.updated).seconds
-
-                # Check if player lost the game
-                elif any(document.board.is_open(mine) for mine in document.board.mines):
-                    document.status = 'lost'
-                    document.player.stats.lost += 1
-                    document.elapsed_seconds += (datetime.datetime.utcnow() - document.updated).seconds
-
-                # Check if game was paused
-                elif document.status == 'paused':
-                    document.elapsed_seconds += (datetime.datetime.utcnow() - document.updated).seconds
-
-            if current_document.status == 'paused':
-                if document.status not in ('paused', 'started'):
-                    document.status = current_document.status
-
-            # Prevent from 'reseting' the game
-            if current_document.status != 'new' and document.status == 'new':
-                document.status = current_document.status
-
-            # Prevent from finishing from idle statuses
-            if current_document.status in ('new', 'paused') and document.status in ('won', 'lost'):
-                document.status = current_document.status
-
-        # Call super-class hook aswell
-        super().pre_save(sender, document, **kwargs)
+        return self._snapshot_version
 
     @property
     def started(self):
@@ -262,6 +136,15 @@ class GameModel(BaseModel, Document):
         """
         return self.status != 'new'
 
+    @property
+    def playing(self):
+        """Returns True when the game is being played (i.e. it has started and it is neither paused nor over).
+
+        :return: True if the game is being played, False otherwise
+        :rtype: bool
+        """
+        return self.status == 'started'
+
     @property
     def paused(self):
         """Returns True when the game is paused.
@@ -297,39 +180,314 @@ class GameModel(BaseModel, Document):
         """Starts a new game.
         """
         if not self.started:
-            self.status = 'started'
-            self.save()
+            self.record('start')
 
     def pause(self):
         """Toggles the game status between 'started' and 'paused'.
         """
         if self.started and not self.finished:
-            self.status = 'started' if self.paused else 'paused'
-            self.save()
+            self.record('pause')
 
     def flag(self, cell):
         """Toggles a board cell as flagged/unflagged.
 
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
         """
-        if self.started and not self.finished:
-            self.board.flag(cell)
-            self.save()
+        if self.playing:
+            self.record('flag', cell)
 
     def open(self, cell):
-        """Reveals a board cell and its surroundings.
+        """Reveals a board cell and its surroundings, finishing the game if it was either lost or won.
 
-        :param cell: The coordinates of a cell in the board
-        :type cell: string
-        :return: True if cell was opened, False otherwise
-        :rtype: bool
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
         """
-        res = False
-        if self.started and not self.finished:
-            res = self.board.open(cell)
-            self.save()
-        return res
+        if self.playing:
+            self.record('open', cell)
+
+    def chord(self, cell):
+        """Reveals the remaining neighbours of an opened cell whose flags match its value, finishing the game if
+        it was either lost or won.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        """
+        if self.playing:
+            self.record('chord', cell)
+
+    def record(self, action, cell=None):
+        """Applies an action to the game and records it as a new game event.
+
+        When the write-behind buffer is enabled, the events of actions that keep the game going are only
+        persisted once the buffer gets flushed. Otherwise, and whenever the game status changes, events are
+        persisted right away. Events failing to be persisted for any reason other than a conflict are kept for
+        the next flush, which the buffer retries when enabled.
+
+        :param action: The action to be applied (either 'start', 'pause', 'flag', 'open' or 'chord')
+        :type action: string
+        :param cell: The (row, column) coordinates of the board cell the action applies to, if any
+        :type cell: tuple | NoneType
+
+        :raise GameConflictException: If the game was updated by someone else since it was loaded, or if the
+        instance was dropped (see `drop`)
+        """
+        with self._lock:
+            if self._dropped:
+                raise GameConflictException(f'Game {self.id} needs to be reloaded')
+
+            event = GameEventModel(
+                game=self,
+                version=self.version + 1,
+                action=action,
+                cell=None if cell is None else self.board._cell_index(cell),
+                created=datetime.datetime.utcnow(),
+            )
+            status = self.status
+            self.apply(event)
+            self._pending_events.append(event)
+
+            if game_buffer.enabled and self.status == status == 'started':
+                game_buffer.add(self)
+            else:
+                # Snapshot the game whenever its status changes, so that it can be queried
+                try:
+                    self.flush(snapshot=self.status != status)
+                except GameConflictException:
+                    game_buffer.discard(self.id)
+                    self.drop()
+                    raise
+                except Exception:
+                    if game_buffer.enabled:
+                        game_buffer.add(self)
+                    raise
+                if self.finished:
+                    game_buffer.discard(self.id)
+
+    def flush(self, snapshot=False):
+        """Persists the game events recorded since the last flush, snapshotting the game every once in a while.
+        Once the game is over, its outcome is also added to the stats of its player.
+
+        .note: Events are only forgotten once they are stored, so a failed flush can be retried as is.
+
+        :param snapshot: Whether to snapshot the game regardless of the number of events recorded
+        :type snapshot: bool
+
+        :raise GameConflictException: If the game was updated by someone else since it was loaded
+        """
+        with self._lock:
+            self._snapshot_pending = self._snapshot_pending or snapshot
+            events = self._pending_events
+            if events:
+                self._insert_events(events)
+                self._pending_events = []
+
+            # Every read replays the events recorded after the last snapshot, and replaying the reveals of large
+            # boards costs as much as performing them, so those boards get snapshotted right away
+            interval = config['app']['game'].get('snapshot_interval', 10)
+            interval_reached = bool(events) and self.version // interval > (events[0].version - 1) // interval
+            costly_replay = self.board.large and any(event.action in ('open', 'chord') for event in events)
+            if self._snapshot_pending or interval_reached or costly_replay:
+                # Keep the snapshot pending until it is stored, so that retrying the flush takes it again
+                self._snapshot_pending = True
+                self.snapshot()
+                self._snapshot_pending = False
+
+            if self.finished and self.stats_recorded is False:
+                self.update_player_stats()
+
+    def drop(self):
+        """Marks the game instance as stale, so that no more actions can be applied to it (e.g. once it conflicted
+        with actions applied elsewhere, or it was deleted).
+        """
+        with self._lock:
+            self._dropped = True
+
+    def update_player_stats(self):
+        """Adds the outcome of the game to the stats of its player, with a single atomic update.
+
+        The game is marked as recorded beforehand with a guarded update, so that the outcome is added at most once
+        no matter how many instances of the game try to, and unmarked if the stats fail to be updated, so that
+        the next flush or load of the game tries again.
+
+        .note: The player is never loaded, so that concurrent games of the same player can't overwrite each
+        other stats.
+        """
+        recorded = get_repository().update(
+            GameModel,
+            {'_id': self.id, 'stats_recorded': False},
+            {'$set': {'stats_recorded': True}},
+        )
+        self.stats_recorded = True
+        if not recorded:
+            return
+
+        if self.status == 'won':
+            board_key = f'{self.board.nbr_rows}x{self.board.nbr_columns}x{self.board.nbr_mines}'
+            update = {
+                '$inc': {'stats.won': 1},
+                '$min': {f'stats.best_times.{board_key}': self.elapsed_seconds},
+            }
+        else:
+            update = {'$inc': {'stats.lost': 1}}
+
+        try:
+            get_repository().update(UserModel, {'_id': self.player.id}, update)
+        except Exception:
+            self.stats_recorded = False
+            get_repository().update(GameModel, {'_id': self.id}, {'$set': {'stats_recorded': False}})
+            raise
+
+    def apply(self, event):
+        """Applies a game event to the game state, without persisting anything.
+
+        :param event: A game event
+        :type event: minesweeper.models.event.GameEventModel
+        """
+        cell = None if event.cell is None else self.board._cell_coordinates(event.cell)
+
+        if event.action == 'start':
+            self.status = 'started'
+        elif event.action == 'pause':
+            if self.paused:
+                self.status = 'started'
+            else:
+                self.status = 'paused'
+                self.elapsed_seconds += (event.created - self.updated).seconds
+        elif event.action == 'flag':
+            self.board.flag(cell)
+        else:
+            outcome = self.board.open(cell) if event.action == 'open' else self.board.chord(cell)
+            if outcome:
+                self.finish(outcome, event.created)
+
+        self.updated = event.created
+        self.version = event.version
+
+    def replay(self, events=None):
+        """Brings the game up to date by applying the events recorded after its last snapshot.
+
+        Tiled boards holding tiles stored ahead of the snapshot (i.e. by a snapshot that failed halfway) are
+        rebuilt from scratch instead, by replaying every event of the game, and get snapshotted on the next flush.
+        Games whose status changed since their last snapshot (i.e. the snapshot of the status change failed) are
+        snapshotted right away, so that they can be queried by their status, and finished games whose outcome
+        failed to be added to the stats of their player get it added.
+
+        :param events: The events recorded after the last snapshot sorted by version, or None to retrieve them
+        :type events: list | NoneType
+
+        :raise MinesweeperException: If the recorded events skip any version of the game
+        """
+        stored_status = self.status
+        self._replay_events(events)
+
+        if isinstance(self.board, TiledBoardModel) and self.board.outdated:
+            self.board.reset()
+            self.status = 'new'
+            self.elapsed_seconds = 0
+            self.version = 0
+            self._replay_events()
+            self._snapshot_pending = True
+
+        if self.status != stored_status:
+            self.snapshot()
+            self._snapshot_pending = False
+
+        if self.finished and self.stats_recorded is False:
+            self.update_player_stats()
+
+    def _replay_events(self, events=None):
+        """Applies the events recorded after the current version of the game, in order.
+
+        :param events: The events recorded after the current version sorted by version, or None to retrieve them
+        :type events: list | NoneType
+
+        :raise MinesweeperException: If the recorded events skip any version of the game
+        """
+        if events is None:
+            events = get_repository().find(
+                GameEventModel,
+                {'game': self.id, 'version': {'$gt': self.version}},
+                sort=[('version', 1)],
+            )
+        for event in events:
+            if event.version != self.version + 1:
+                raise MinesweeperException(f'Game {self.id} has no event for version {self.version + 1}')
+            self.apply(event)
+
+    def _insert_events(self, events):
+        """Stores a batch of game events, picking up where a previous attempt that failed halfway left off.
+
+        .note: Events get their ids before being stored, so the ones already stored by a previous attempt can be
+        told apart from the ones recorded by someone else.
+
+        :param events: The game events to be stored, sorted by version
+        :type events: list
+
+        :raise GameConflictException: If someone else already recorded any of the event versions
+        """
+        for event in events:
+            if event.id is None:
+                event.id = ObjectId()
+
+        try:
+            get_repository().insert_all(events)
+        except NotUniqueError:
+            stored = {
+                event.version: event.id
+                for event in get_repository().find(
+                    GameEventModel,
+                    {'game': self.id, 'version': {'$gte': events[0].version}},
+                    only=('id', 'version'),
+                )
+            }
+            if any(stored.get(event.version, event.id) != event.id for event in events):
+                raise GameConflictException(f'Game {self.id} was updated after version {events[0].version - 1}')
+            get_repository().insert_all([event for event in events if event.version not in stored])
+
+    def snapshot(self):
+        """Persists the current state of the game with a single atomic update, once the tiles of tiled boards
+        changed since they were loaded have been saved.
+
+        Only the game status, its timing and the board values changed since the game was loaded are written, and
+        the update is skipped if a newer snapshot of the game was already stored.
+
+        .note: Board changes are only forgotten once the update succeeds, so a failed snapshot can be retried.
+        """
+        changes = {
+            'status': self.status,
+            'elapsed_seconds': self.elapsed_seconds,
+            'updated': self.updated,
+            'version': self.version,
+        }
+        changes.update({f'board.{path}': value for path, value in self.board.pending_changes().items()})
+
+        # Tiles go first, so that the stored game is never ahead of them (see `replay`)
+        if isinstance(self.board, TiledBoardModel):
+            self.board.save_tiles(self.version)
+
+        # Games stored before events were recorded have no version yet
+        updated = get_repository().update(
+            GameModel,
+            {'_id': self.id, '$or': [{'version': {'$lt': self.version}}, {'version': {'$exists': False}}]},
+            {'$set': changes},
+        )
+        self.board.clear_changes()
+        self._snapshot_version = self.version
+        if not updated:
+            return
+        self._clear_changed_fields()
+
+    def finish(self, status, finished_at):
+        """Concludes the game.
+
+        :param status: The final status of the game (either 'won' or 'lost')
+        :type status: string
+        :param finished_at: The time the game was concluded
+        :type finished_at: datetime.datetime
+        """
+        self.status = status
+        self.elapsed_seconds += (finished_at - self.updated).seconds
 
     def __repr__(self):
         return f'<Game {self.id} ({self.status})>'
@@ -339,3 +497,8 @@ class GameModel(BaseModel, Document):
 
 
 signals.pre_save.connect(GameModel.pre_save, sender=GameModel)
+signals.post_save.connect(GameModel.post_save, sender=GameModel)
+signals.post_delete.connect(GameModel.post_delete, sender=GameModel)
+
+GameModel.register_delete_rule(GameEventModel, 'game', CASCADE)
+GameModel.register_delete_rule(TileModel, 'game', CASCADE)
@@ -0,0 +1,633 @@
+from random import getrandbits
+
+from bson import Binary
+
+import numpy
+from scipy import ndimage
+
+from mongoengine import (
+    Document,
+    NotUniqueError,
+    ValidationError,
+)
+from mongoengine.fields import (
+    IntField,
+    LazyReferenceField,
+)
+
+from .board import (
+    BoardModel,
+    CELL_FLAGGED,
+    CELL_MINE,
+    CELL_OPENED,
+    CELL_VALUE_SHIFT,
+    NEIGHBOURHOOD,
+)
+from .fields import ByteGridField
+from minesweeper.config import config
+from minesweeper.databases.base import get_repository
+
+
+class TileModel(Document):
+    """Database model for a tile of a TiledBoardModel
+
+    Tiles only need to be stored once any of their cells gets flagged or opened.
+    """
+    game = LazyReferenceField('GameModel')
+    row = IntField(min_value=0)
+    column = IntField(min_value=0)
+    cells = ByteGridField()
+    version = IntField(min_value=0, default=0)
+
+    meta = {
+        'indexes': [
+            {'fields': ('game', 'row', 'column'), 'unique': True},
+        ],
+        'auto_create_index': False,
+    }
+
+    def __repr__(self):
+        return f'<Tile {self.id} ({self.row}, {self.column})>'
+
+    def __str__(self):
+        return f'<Tile {self.id} ({self.row}, {self.column})>'
+
+
+class TiledBoardModel(BoardModel):
+    """Database model for the huge boards of a GameResource
+
+    The board is split into square tiles of `tile_size` cells per side, each one stored as a TileModel of its
+    own and loaded only when an action reaches it. Cell states use the same layout as the `BoardModel.cells`
+    grid, but mines are never stored: once the first cell is opened, the mines of each tile are derived from
+    the board `seed`, so untouched tiles cost nothing.
+
+    Tiles are saved before the game snapshot they belong to, so a snapshot failing halfway may leave some tiles
+    ahead of the stored game. Boards loading such tiles get `outdated`, as replaying the game actions on them
+    would apply some of the actions twice.
+
+    .note: The `mines`, `flagged` and `opened` properties only cover the tiles that have been played, and load
+    all of them. Regions of the board are better read through `region_states`.
+    """
+    mode = 'tiled'
+
+    action_fields = BoardModel.action_fields + ('first_cell',)
+
+    tile_size = IntField(min_value=8)
+    first_cell = IntField(min_value=0)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tiles = {}
+        self._dirty_tiles = set()
+        self._tiles_mines = {}
+        self._stored_tiles_loaded = False
+        self._checkpoint = None
+        self._outdated = False
+        self._detached = False
+
+    def clean(self):
+        """Validates the board dimensions.
+
+        .note: Tiles are not allocated until they are first needed.
+        """
+        tiled_config = config['app']['game'].get('tiled') or {}
+        max_rows = tiled_config.get('max_rows', 5000)
+        max_columns = tiled_config.get('max_columns', 5000)
+
+        # Check nbr_rows is in range
+        if not 2 <= self.nbr_rows <= max_rows:
+            raise ValidationError(f'Number of rows exceeds the maximum of {max_rows}')
+
+        # Check nbr_columns is in range
+        if not 2 <= self.nbr_columns <= max_columns:
+            raise ValidationError(f'Number of columns exceeds the maximum of {max_columns}')
+
+        # Check nbr_mines is in range, leaving at least one cell free of mines
+        max_mines = min(tiled_config.get('max_mines') or self.nbr_cells, self.nbr_cells - 1)
+        if not 1 <= self.nbr_mines <= max_mines:
+            raise ValidationError(f'Number of mines exceeds the maximum of {max_mines}')
+
+        # Pick the seed up front, so that replaying the game actions always places the same mines
+        if self.seed is None:
+            self.seed = getrandbits(32)
+
+        if self.tile_size is None:
+            self.tile_size = tiled_config.get('tile_size', 64)
+
+    @property
+    def outdated(self):
+        """Returns True when any of the loaded tiles was stored for a newer version than the game snapshot.
+
+        :return: True if the board holds tiles ahead of the game snapshot, False otherwise
+        :rtype: bool
+        """
+        return self._outdated
+
+    @property
+    def nbr_tile_rows(self):
+        """Returns the number of rows of tiles in the board.
+
+        :return: The number of rows of tiles in the board
+        :rtype: int
+        """
+        return -(-self.nbr_rows // self.tile_size)
+
+    @property
+    def nbr_tile_columns(self):
+        """Returns the number of columns of tiles in the board.
+
+        :return: The number of columns of tiles in the board
+        :rtype: int
+        """
+        return -(-self.nbr_columns // self.tile_size)
+
+    def place_mines(self, index):
+        """Settles where the board mines are, keeping them away from the given cell and its neighbours.
+
+        .note: Mines of each tile are only derived when the tile gets loaded, see `_tile_mines`.
+
+        :param index: The index of the first cell opened in the board (in row-major order)
+        :type index: int
+        """
+        if self.seed is None:
+            self.seed = getrandbits(32)
+
+        self.first_cell = index
+        self.generated = True
+
+        # Add the mines to the tiles that were already loaded
+        for key, cells in self._tiles.items():
+            self._track(key)
+            self._add_mines(key, cells)
+
+    @property
+    def mines(self):
+        """Returns the list of cells that hold a mine, among the played tiles.
+
+        :return: The (row, column) coordinates of the mined cells
+        :rtype: list
+        """
+        self._load_stored_tiles()
+        return [cell for cell, state in self._loaded_cells() if state & CELL_MINE]
+
+    @property
+    def flagged(self):
+        """Returns the list of cells that are flagged, among the played tiles.
+
+        :return: The (row, column) coordinates of the flagged cells
+        :rtype: list
+        """
+        self._load_stored_tiles()
+        return [cell for cell, state in self._loaded_cells() if state & CELL_FLAGGED]
+
+    @property
+    def opened(self):
+        """Returns the list of cells that are opened along with their values, among the played tiles.
+
+        :return: The (row, column, value) tuples of the opened cells
+        :rtype: list
+        """
+        self._load_stored_tiles()
+        return [(*cell, self._state_value(state)) for cell, state in self._loaded_cells() if state & CELL_OPENED]
+
+    def flag(self, cell):
+        """Toggles a board cell as flagged/unflagged.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        """
+        key, cells, position = self._locate(*cell)
+        self._track(key)
+        if cells[position] & CELL_FLAGGED:
+            cells[position] &= ~CELL_FLAGGED
+        elif not cells[position] & CELL_OPENED:
+            cells[position] |= CELL_FLAGGED
+        self._dirty_tiles.add(key)
+
+    def open(self, cell):
+        """Reveals a board cell and its surroundings, loading the tiles the reveal reaches.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The status the game moves to because of the revealed cells ('lost' when a mine explodes or
+        'won' when all the cells free of mines are opened), or None if the game goes on
+        :rtype: string | NoneType
+        """
+        row, column = cell
+
+        # Load the tiles surrounding the cell all at once
+        tile_row, tile_column = row // self.tile_size, column // self.tile_size
+        self._load_tiles([
+            (r, c)
+            for r in range(max(0, tile_row - 1), min(self.nbr_tile_rows, tile_row + 2))
+            for c in range(max(0, tile_column - 1), min(self.nbr_tile_columns, tile_column + 2))
+        ])
+
+        # If cell can't be opened, return
+        if self._state(row, column) & (CELL_FLAGGED | CELL_OPENED):
+            return None
+
+        # Place the mines on the first cell opening, so that it never explodes
+        if not self.generated:
+            self.place_mines(self._cell_index(cell))
+
+        # Mark cell as opened
+        opened_state = self._state(row, column)
+        self._open_cell(row, column)
+
+        # And if the cell didn't explode then...
+        if not opened_state & CELL_MINE:
+            # Find neighbours that also need to be opened, visiting each cell at most once
+            pending = [n for n in self._neighbour_cells(row, column) if not self._state(*n) & CELL_OPENED]
+            while pending:
+                neighbour = pending.pop()
+                state = self._state(*neighbour)
+                if not state & (CELL_MINE | CELL_OPENED):
+                    self._open_cell(*neighbour)
+                    if not state >> CELL_VALUE_SHIFT:
+                        pending.extend(
+                            n for n in self._neighbour_cells(*neighbour) if not self._state(*n) & CELL_OPENED
+                        )
+
+        return self._outcome(opened_state)
+
+    def is_mine(self, cell):
+        """Indicates whether a cell is a mine or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is a mine, False otherwise
+        :rtype: bool
+        """
+        return bool(self._state(*cell) & CELL_MINE)
+
+    def is_flagged(self, cell):
+        """Indicates whether a cell is flagged or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is flagged, False otherwise
+        :rtype: bool
+        """
+        return bool(self._state(*cell) & CELL_FLAGGED)
+
+    def is_open(self, cell):
+        """Indicates whether a cell is opened or not.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: True if the cell is opened, False otherwise
+        :rtype: bool
+        """
+        return bool(self._state(*cell) & CELL_OPENED)
+
+    def value(self, cell):
+        """Indicates the number of mines surrounding the cell.
+
+        :param cell: The (row, column) coordinates of a cell in the board
+        :type cell: tuple
+        :return: The number of mines surrounding the cell
+        :rtype: int
+        """
+        return self._state_value(self._state(*cell))
+
+    def region_states(self, row, column, nbr_rows, nbr_columns):
+        """Returns the states of the cells within a rectangular region of the board, loading only the tiles the
+        region overlaps.
+
+        :param row: The row of the top left cell of the region
+        :type row: int
+        :param column: The column of the top left cell of the region
+        :type column: int
+        :param nbr_rows: The number of rows of the region
+        :type nbr_rows: int
+        :param nbr_columns: The number of columns of the region
+        :type nbr_columns: int
+        :return: The states of the region cells in row-major order, as in the `BoardModel.cells` grid
+        :rtype: bytes
+        """
+        keys = [
+            (tile_row, tile_column)
+            for tile_row in range(row // self.tile_size, (row + nbr_rows - 1) // self.tile_size + 1)
+            for tile_column in range(column // self.tile_size, (column + nbr_columns - 1) // self.tile_size + 1)
+        ]
+        self._load_tiles(keys)
+
+        states = numpy.zeros((nbr_rows, nbr_columns), dtype=numpy.uint8)
+        for tile_row, tile_column in keys:
+            height, width = self._tile_shape(tile_row, tile_column)
+            cells = numpy.frombuffer(bytes(self._tiles[(tile_row, tile_column)]), dtype=numpy.uint8)
+            cells = cells.reshape(height, width)
+
+            # Copy the part of the tile within the region
+            top, left = tile_row * self.tile_size, tile_column * self.tile_size
+            first_row, last_row = max(row, top), min(row + nbr_rows, top + height)
+            first_column, last_column = max(column, left), min(column + nbr_columns, left + width)
+            region = states[first_row - row:last_row - row, first_column - column:last_column - column]
+            region[...] = cells[first_row - top:last_row - top, first_column - left:last_column - left]
+        return states.tobytes()
+
+    def checkpoint(self):
+        """Overwrites BoardModel.checkpoint.
+
+        .note: Tiles are only added to the checkpoint as they are about to change, so that capturing it and
+        looking for the changed cells only costs as much as the tiles the actions touch.
+        """
+        self._checkpoint = {}
+        return self._checkpoint
+
+    def changed_cells(self, checkpoint):
+        """Overwrites BoardModel.changed_cells.
+
+        .note: Tiles stop being added to the checkpoint from then on.
+        """
+        self._checkpoint = None
+        changes = []
+        for key, before in checkpoint.items():
+            cells = self._tiles[key]
+            if before == cells:
+                continue
+
+            _, width = self._tile_shape(*key)
+            first_row, first_column = key[0] * self.tile_size, key[1] * self.tile_size
+            before = numpy.frombuffer(before, dtype=numpy.uint8)
+            after = numpy.frombuffer(bytes(cells), dtype=numpy.uint8)
+            for position in numpy.flatnonzero(before != after).tolist():
+                row, column = divmod(position, width)
+                changes.append((first_row + row, first_column + column, int(before[position]), int(after[position])))
+        return changes
+
+    def reset(self):
+        """Brings the board back to its state before the first action, ignoring the tiles stored so far.
+
+        .note: Meant for rebuilding outdated boards by replaying every action of their game, which plays again
+        all the tiles that were ever stored.
+        """
+        self.generated = False
+        self.first_cell = None
+        self.nbr_opened = 0
+        self._tiles = {}
+        self._dirty_tiles = set()
+        self._tiles_mines = {}
+        self._stored_tiles_loaded = True
+        self._outdated = False
+        self._detached = True
+
+    def save_tiles(self, version):
+        """Persists the tiles that changed since they were loaded, in a single batch of updates.
+
+        Tiles keep the version of the game they were saved for, and are never overwritten with the state of an
+        older version.
+
+        :param version: The version of the game the tiles belong to
+        :type version: int
+        """
+        if not self._dirty_tiles:
+            return
+
+        game_id = self._instance.id
+        try:
+            get_repository().update_all(TileModel, [
+                (
+                    {'game': game_id, 'row': tile_row, 'column': tile_column, 'version': {'$lt': version}},
+                    {'$set': {'cells': Binary(bytes(self._tiles[(tile_row, tile_column)])), 'version': version}},
+                )
+                for tile_row, tile_column in self._dirty_tiles
+            ], upsert=True)
+        except NotUniqueError:
+            # Tiles already saved for a newer version fail to be upserted again, which is fine
+            pass
+        self._dirty_tiles.clear()
+
+    def _state(self, row, column):
+        """Returns the state of a cell, loading its tile if needed.
+
+        :param row: The row of a cell in the board
+        :type row: int
+        :param column: The column of a cell in the board
+        :type column: int
+        :return: The state of the cell, as in the `BoardModel.cells` grid
+        :rtype: int
+        """
+        _, cells, position = self._locate(row, column)
+        return cells[position]
+
+    def _open_cell(self, row, column):
+        """Marks a cell as opened.
+
+        :param row: The row of a cell in the board
+        :type row: int
+        :param column: The column of a cell in the board
+        :type column: int
+        """
+        key, cells, position = self._locate(row, column)
+        self._track(key)
+        cells[position] |= CELL_OPENED
+        self._dirty_tiles.add(key)
+        self.nbr_opened += 1
+
+    def _track(self, key):
+        """Adds a tile that is about to change to the checkpoint being captured, if any and unless it was already
+        added.
+
+        :param key: The (row, column) coordinates of the tile
+        :type key: tuple
+        """
+        if self._checkpoint is not None and key not in self._checkpoint:
+            self._checkpoint[key] = bytes(self._tiles[key])
+
+    def _locate(self, row, column):
+        """Finds the tile holding a cell, and the position of the cell within the tile.
+
+        :param row: The row of a cell in the board
+        :type row: int
+        :param column: The column of a cell in the board
+        :type column: int
+        :return: The (row, column) coordinates of the tile, the tile cells and the position of the cell in them
+        :rtype: tuple
+        """
+        key = (row // self.tile_size, column // self.tile_size)
+        cells = self._tiles.get(key)
+        if cells is None:
+            self._load_tiles([key])
+            cells = self._tiles[key]
+        _, width = self._tile_shape(*key)
+        return key, cells, (row % self.tile_size) * width + column % self.tile_size
+
+    def _neighbour_cells(self, row, column):
+        """Returns the neighbours of a cell.
+
+        :param row: The row of a cell in the board
+        :type row: int
+        :param column: The column of a cell in the board
+        :type column: int
+        :return: The (row, column) coordinates of the neighbour cells
+        :rtype: list
+        """
+        return [
+            (r, c)
+            for r in range(max(0, row - 1), min(self.nbr_rows, row + 2))
+            for c in range(max(0, column - 1), min(self.nbr_columns, column + 2))
+            if r != row or c != column
+        ]
+
+    def _loaded_cells(self):
+        """Iterates over the cells of the loaded tiles that have been played (i.e. that have any flagged or
+        opened cell), so that the board looks the same whether it was just played or loaded from the database.
+
+        :return: A generator of ((row, column), state) tuples
+        :rtype: generator
+        """
+        for (tile_row, tile_column), cells in sorted(self._tiles.items()):
+            if not any(state & (CELL_FLAGGED | CELL_OPENED) for state in cells):
+                continue
+            _, width = self._tile_shape(tile_row, tile_column)
+            for position, state in enumerate(cells):
+                row, column = divmod(position, width)
+                yield (tile_row * self.tile_size + row, tile_column * self.tile_size + column), state
+
+    def _load_tiles(self, keys):
+        """Loads a set of tiles from the database with a single query, creating the ones never stored.
+
+        :param keys: The (row, column) coordinates of the tiles to be loaded
+        :type keys: list
+        """
+        keys = [key for key in keys if key not in self._tiles]
+        if not keys:
+            return
+
+        stored = {}
+        if not self._detached and self._instance is not None and self._instance.id is not None:
+            query = {
+                'game': self._instance.id,
+                '$or': [{'row': tile_row, 'column': tile_column} for tile_row, tile_column in keys],
+            }
+            for tile in get_repository().find(TileModel, query):
+                stored[(tile.row, tile.column)] = tile.cells
+                self._outdated = self._outdated or tile.version > self._instance.snapshot_version
+
+        for key in keys:
+            height, width = self._tile_shape(*key)
+            cells = stored.get(key) or bytearray(height * width)
+            if self.generated:
+                self._add_mines(key, cells)
+            self._tiles[key] = cells
+
+    def _load_stored_tiles(self):
+        """Loads all the tiles of the board that were stored in the database and are not loaded yet.
+        """
+        if self._stored_tiles_loaded:
+            return
+
+        if self._instance is not None and self._instance.id is not None:
+            for tile in get_repository().find(TileModel, {'game': self._instance.id}):
+                key = (tile.row, tile.column)
+                if key in self._tiles:
+                    continue
+                self._outdated = self._outdated or tile.version > self._instance.snapshot_version
+                if self.generated:
+                    self._add_mines(key, tile.cells)
+                self._tiles[key] = tile.cells
+
+        self._stored_tiles_loaded = True
+
+    def _add_mines(self, key, cells):
+        """Sets the mines of a tile, along with the number of mines surrounding each of its cells.
+
+        :param key: The (row, column) coordinates of the tile
+        :type key: tuple
+        :param cells: The tile cells, which get updated in place
+        :type cells: bytearray
+        """
+        tile_row, tile_column = key
+        height, width = self._tile_shape(tile_row, tile_column)
+
+        # Lay out the mines of the tile and of its neighbour tiles
+        first_row, first_column = max(0, tile_row - 1), max(0, tile_column - 1)
+        last_row = min(self.nbr_tile_rows, tile_row + 2)
+        last_column = min(self.nbr_tile_columns, tile_column + 2)
+        block = numpy.zeros((
+            min(self.nbr_rows, last_row * self.tile_size) - first_row * self.tile_size,
+            min(self.nbr_columns, last_column * self.tile_size) - first_column * self.tile_size,
+        ), dtype=numpy.uint8)
+        for r in range(first_row, last_row):
+            for c in range(first_column, last_column):
+                h, w = self._tile_shape(r, c)
+                mines = numpy.zeros(h * w, dtype=numpy.uint8)
+                mines[self._tile_mines(r, c)] = CELL_MINE
+                top, left = (r - first_row) * self.tile_size, (c - first_column) * self.tile_size
+                block[top:top + h, left:left + w] = mines.reshape(h, w)
+
+        # Count the mines surrounding each cell, and keep the tile ones
+        counts = ndimage.convolve(block, NEIGHBOURHOOD.astype(numpy.uint8), mode='constant') - block
+        block |= counts << CELL_VALUE_SHIFT
+        top, left = (tile_row - first_row) * self.tile_size, (tile_column - first_column) * self.tile_size
+        grid = block[top:top + height, left:left + width]
+
+        states = numpy.frombuffer(cells, dtype=numpy.uint8).reshape(height, width)
+        states &= CELL_FLAGGED | CELL_OPENED
+        states |= grid
+
+    def _tile_mines(self, tile_row, tile_column):
+        """Returns the positions of the mines within a tile.
+
+        Mines are spread so that each tile gets its share of `nbr_mines`, proportional to its number of
+        cells, and then randomly placed within the tile from a generator seeded with the board seed and the
+        tile coordinates.
+
+        :param tile_row: The row of the tile
+        :type tile_row: int
+        :param tile_column: The column of the tile
+        :type tile_column: int
+        :return: The positions of the mines within the tile cells
+        :rtype: numpy.ndarray
+        """
+        key = (tile_row, tile_column)
+        if key in self._tiles_mines:
+            return self._tiles_mines[key]
+
+        height, width = self._tile_shape(tile_row, tile_column)
+
+        # Find out which cells must be kept free of mines
+        first_row, first_column = self._cell_coordinates(self.first_cell)
+        safe_cells = [(first_row, first_column)] + self._neighbour_cells(first_row, first_column)
+        if self.nbr_cells - len(safe_cells) < self.nbr_mines:
+            safe_cells = [(first_row, first_column)]
+        safe_keys = [(r // self.tile_size, c // self.tile_size) for r, c in safe_cells]
+        tile_safe_cells = sorted(
+            (r % self.tile_size) * width + c % self.tile_size
+            for (r, c), safe_key in zip(safe_cells, safe_keys) if safe_key == key
+        )
+
+        # Count the cells that may hold a mine before and within the tile (with tiles in row-major order)
+        nbr_cells_before = tile_row * self.tile_size * self.nbr_columns + tile_column * self.tile_size * height
+        start = nbr_cells_before - sum(1 for safe_key in safe_keys if safe_key < key)
+        end = start + height * width - len(tile_safe_cells)
+
+        # Give the tile its share of mines
+        nbr_candidates = self.nbr_cells - len(safe_cells)
+        nbr_mines = end * self.nbr_mines // nbr_candidates - start * self.nbr_mines // nbr_candidates
+
+        # Sample mines positions without replacement among the cells of the tile
+        rng = numpy.random.default_rng([self.seed, tile_row, tile_column])
+        mines = rng.choice(height * width - len(tile_safe_cells), nbr_mines, replace=False)
+        for safe_cell in tile_safe_cells:
+            mines[mines >= safe_cell] += 1
+
+        self._tiles_mines[key] = mines
+        return mines
+
+    def _tile_shape(self, tile_row, tile_column):
+        """Returns the dimensions of a tile, as tiles on the bottom and right edges may be smaller.
+
+        :param tile_row: The row of the tile
+        :type tile_row: int
+        :param tile_column: The column of the tile
+        :type tile_column: int
+        :return: The number of rows and columns of the tile
+        :rtype: tuple
+        """
+        return (
+            min(self.tile_size, self.nbr_rows - tile_row * self.tile_size),
+            min(self.tile_size, self.nbr_columns - tile_column * self.tile_size),
+        )
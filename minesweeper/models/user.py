@@ -7,6 +7,7 @@ from mongoengine.fields import (
     EmbeddedDocumentField,
     IntField,
     ListField,
+    MapField,
     StringField,
 )
 
@@ -18,6 +19,8 @@ class UserStatsModel(EmbeddedDocument):
     """
     won = IntField(min_value=0, default=0)
     lost = IntField(min_value=0, default=0)
+    # Shortest elapsed seconds of the games won, by board dimensions (e.g. '9x9x10' for rows x columns x mines)
+    best_times = MapField(IntField(min_value=0))
 
 
 class UserModel(BaseModel, Document):
@@ -29,6 +32,10 @@ class UserModel(BaseModel, Document):
     password = StringField(required=True, min_length=8)
     stats = EmbeddedDocumentField(UserStatsModel, default=UserStatsModel)
 
+    meta = {
+        'auto_create_index': False,
+    }
+
     def __repr__(self):
         return f'<User {self.id} ({self.email})>'
 
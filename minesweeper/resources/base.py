@@ -1,3 +1,4 @@
+import json
 from abc import ABC, abstractmethod
 from bson import ObjectId
 
@@ -5,6 +6,22 @@ import falcon
 import mongoengine
 from marshmallow import ValidationError
 
+from minesweeper.common.media import NDJSON_MEDIA_TYPE
+from minesweeper.config import config
+from minesweeper.databases.base import get_repository
+from minesweeper.serializers.compiled import (
+    get_dumper,
+    get_schema,
+)
+from minesweeper.serializers.pagination import (
+    CollectionQuerySchema,
+    dump_cursor,
+)
+
+
+# Number of instances encoded at once when streaming a collection
+NDJSON_BATCH_SIZE = 100
+
 
 class BaseResource(ABC):
     """Abstract class for modeling a base API resource or collection of resources.
@@ -12,6 +29,13 @@ class BaseResource(ABC):
     resource_name = None
     model_cls = None
     schema_cls = None
+    query_schema_cls = CollectionQuerySchema
+    # Names of the model fields needed to serialize a resource instance, or None to load all of them
+    load_fields = None
+
+    def __init__(self):
+        # Compile the resource serializer up front, so that no request has to wait for it
+        get_dumper(self.schema_cls)
 
     def on_get(self, req, resp, **params):
         """Retrieves a resource instance from the database.
@@ -24,11 +48,11 @@ class BaseResource(ABC):
         params derived from the route's URI template fields
         :type params: dict
         """
-        # Look for the resource with the matching id in the database
-        resource_obj = self.get_or_raise_404(params[self.resource_name])
+        # Look for the resource with the matching id in the database, loading only the fields to be serialized
+        resource_obj = self.get_or_raise_404(params[self.resource_name], only=self.load_fields)
 
         # Return serialized user object
-        resp.media = self.serialize(resource_obj)
+        resp.media = self.serialize(resource_obj, schema_cls=self.get_response_schema_cls(req, resource_obj))
 
     def on_put(self, req, resp, **params):
         """Fully-updates a resource instance from the database.
@@ -73,17 +97,55 @@ class BaseResource(ABC):
         resource_obj = self.get_or_raise_404(params[self.resource_name])
 
         # Delete resource
-        resource_obj.delete()
+        get_repository().delete(resource_obj)
 
     def on_get_collection(self, req, resp):
-        """Retrieves several instances of a resource from the database.
+        """Retrieves a page of instances of a resource from the database.
+
+        Instances are sorted by id, and pages are requested by passing the `next` cursor of the previous page as
+        the `after` query parameter, so that each page is read straight from an index no matter its position.
+        With `format=ndjson`, every instance is streamed instead, one JSON document per line.
 
         :param req: An HTTP request object
         :type req: falcon.request.Request
         :param resp: An HTTP response object
         :type resp: falcon.response.Response
+
+        :raise falcon.HTTPBadRequest: If the query parameters are invalid
         """
-        resp.media = {'records': self.serialize(self.model_cls.objects, many=True)}
+        # Load the page and filter parameters
+        try:
+            query_data = get_schema(self.query_schema_cls).load(req.params)
+        except ValidationError as err:
+            raise falcon.HTTPBadRequest(f'Invalid {self.resource_name} query', err.messages)
+
+        ndjson = query_data.pop('format', 'json') == 'ndjson'
+        default_limit = None if ndjson else (config['app'].get('pagination') or {}).get('default_limit', 50)
+        limit = query_data.pop('limit', default_limit)
+        after = query_data.pop('after', None)
+
+        # Filter on the remaining parameters, starting right after the previous page
+        query = {self.model_cls._fields[name].db_field: value for name, value in query_data.items()}
+        if after is not None:
+            query['_id'] = {'$gt': after}
+
+        if ndjson:
+            resp.content_type = NDJSON_MEDIA_TYPE
+            resp.stream = self._stream_ndjson(
+                get_repository().find(self.model_cls, query, sort=[('_id', 1)], limit=limit, only=self.load_fields)
+            )
+            return
+
+        # Fetch an extra instance to find out whether there is a next page
+        records = list(get_repository().find(
+            self.model_cls, query, sort=[('_id', 1)], limit=limit + 1, only=self.load_fields
+        ))
+        next_cursor = dump_cursor(records[limit - 1].id) if len(records) > limit else None
+
+        # Stored instances may lag behind, see `BaseModel.bring_up_to_date`
+        records = self.model_cls.bring_up_to_date(records[:limit])
+
+        resp.media = {'records': self.serialize(records, many=True), 'next': next_cursor}
 
     def on_post_collection(self, req, resp):
         """Adds a new resource instance to the database.
@@ -100,10 +162,51 @@ class BaseResource(ABC):
 
         # Add new resource to the db
         resource_obj = self._create_resource(resource_data)
-        resource_obj.save()
+        schema_cls = self.get_response_schema_cls(req, resource_obj)
+        self._save_resource(resource_obj)
 
         # Return serialized new resource object
-        resp.media = self.serialize(resource_obj)
+        resp.media = self.serialize(resource_obj, schema_cls=schema_cls)
+
+    @classmethod
+    def _stream_ndjson(cls, resource_objs):
+        """Auxiliary generator for encoding resource instances as newline-delimited JSON, in batches.
+
+        .note: Instances are brought up to date and serialized a batch at a time as they are read, so that the
+        collection is never held in memory.
+
+        :param resource_objs: An iterator over resource instances
+        :type resource_objs: iterator
+        :return: A generator of chunks of encoded instances
+        :rtype: generator
+        """
+        dump = get_dumper(cls.schema_cls)
+        batch = []
+        for resource_obj in resource_objs:
+            batch.append(resource_obj)
+            if len(batch) == NDJSON_BATCH_SIZE:
+                yield cls._encode_ndjson(dump, batch)
+                batch = []
+        if batch:
+            yield cls._encode_ndjson(dump, batch)
+
+    @classmethod
+    def _encode_ndjson(cls, dump, resource_objs):
+        """Auxiliary method for encoding a batch of resource instances as newline-delimited JSON, once brought
+        up to date.
+
+        :param dump: The serializer of the resource instances, as returned by `get_dumper`
+        :type dump: callable
+        :param resource_objs: A list of resource instances
+        :type resource_objs: list
+        :return: The encoded instances
+        :rtype: bytes
+        """
+        lines = [
+            json.dumps(dump(resource_obj), ensure_ascii=False)
+            for resource_obj in cls.model_cls.bring_up_to_date(resource_objs)
+        ]
+        return ('\n'.join(lines) + '\n').encode()
 
     @abstractmethod
     def _create_resource(self, resource_data):
@@ -119,6 +222,17 @@ class BaseResource(ABC):
         """
         pass
 
+    def _save_resource(self, resource_obj):
+        """Auxiliary method for persisting a new or updated resource instance.
+
+        .note: This method can be overwritten by especific resource classes in order to handle their own
+        persistence errors.
+
+        :param resource_obj: A resource instance
+        :type resource_obj: minesweeper.models.base.BaseModel
+        """
+        get_repository().save(resource_obj)
+
     def _update_resource(self, req, resp, **params):
         """Auxiliary method for updating a resource instance from the database
         by its unique resource_id.
@@ -145,24 +259,29 @@ class BaseResource(ABC):
         for attr in dir(resource_obj):
             if attr in resource_data.keys():
                 setattr(resource_obj, attr, resource_data[attr])
-        resource_obj.save()
+        schema_cls = self.get_response_schema_cls(req, resource_obj)
+        self._save_resource(resource_obj)
 
         # Return serialized user object
-        resp.media = self.serialize(resource_obj)
+        resp.media = self.serialize(resource_obj, schema_cls=schema_cls)
 
     @classmethod
-    def get_or_raise_404(cls, resource_id):
+    def get_or_raise_404(cls, resource_id, only=None):
         """Auxiliary method for retrieving a resource instance from the database by its unique resource_id.
 
+        .note: Instances loaded with only some of their fields must never be saved.
+
         :param resource_id: A resource instance unique identifier
         :type resource_id: string
+        :param only: The names of the only fields to be loaded, or None to load all of them
+        :type only: tuple | NoneType
         :return: The resource instance matching the given resource_id
         :rtype: minesweeper.models.base.BaseModel
 
         :raise falcon.HTTPNotFound: If no resource instance matches the given resource_id
         """
 
-        resource_obj = cls.model_cls.get_by_id(ObjectId(resource_id))
+        resource_obj = cls.model_cls.get_by_id(ObjectId(resource_id), only=only)
         if resource_obj is None:
             raise falcon.HTTPNotFound(
                 title='Not Found',
@@ -170,6 +289,22 @@ class BaseResource(ABC):
             )
         return resource_obj
 
+    @classmethod
+    def get_response_schema_cls(cls, req, resource_obj):
+        """Auxiliary method for choosing the schema a resource instance is serialized with in a response.
+
+        .note: This method can be overwritten by especific resource classes in order to offer several
+        representations of their instances.
+
+        :param req: An HTTP request object
+        :type req: falcon.request.Request
+        :param resource_obj: The resource instance to be serialized
+        :type resource_obj: minesweeper.models.base.BaseModel
+        :return: The schema class to serialize the resource instance with
+        :rtype: marshmallow.Schema
+        """
+        return cls.schema_cls
+
     @classmethod
     def deserialize(cls, payload, partial=False):
         """Deserialize a resource method from a JSON form into a Python dict.
@@ -181,9 +316,8 @@ class BaseResource(ABC):
         :return: A dictionary with deserialized data from the payload
         :rtype: dict
         """
-        serializer = cls.schema_cls()
         try:
-            resource_data = serializer.load(payload, partial=partial)
+            resource_data = get_schema(cls.schema_cls).load(payload, partial=partial)
         except ValidationError as err:
             raise falcon.HTTPBadRequest(
                 f'Invalid {cls.resource_name} payload',
@@ -192,15 +326,17 @@ class BaseResource(ABC):
         return resource_data
 
     @classmethod
-    def serialize(cls, resource, many=False):
+    def serialize(cls, resource, many=False, schema_cls=None):
         """Serialize a resource object or collection of resources objects into a JSON form.
 
         :param resource: An API resource or collection of resources
         :type resource: minesweeper.models.base.BaseModel
         :param many: Flag that indicates if more than one resource need to be serialized
         :type many: bool
+        :param schema_cls: The schema to serialize the resource with, instead of the resource `schema_cls`
+        :type schema_cls: marshmallow.Schema | NoneType
         :return: A JSON object with the serialized data from the resource
         :rtype: json
         """
-        serializer = cls.schema_cls(many=many)
-        return serializer.dump(resource)
+        dump = get_dumper(schema_cls or cls.schema_cls)
+        return [dump(resource_obj) for resource_obj in resource] if many else dump(resource)
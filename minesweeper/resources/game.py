@@ -2,8 +2,19 @@ import falcon
 
 from .base import BaseResource
 from .user import UserResource
-from minesweeper.models.game import GameModel
-from minesweeper.serializers.game import GameSchema
+from minesweeper.config import config
+from minesweeper.models.game import (
+    BOARD_MODELS,
+    GameModel,
+)
+from minesweeper.serializers.compiled import get_dumper
+from minesweeper.serializers.game import (
+    dump_region,
+    GameBytesSchema,
+    GameCollectionQuerySchema,
+    GameGridSchema,
+    GameSchema,
+)
 
 
 class GameResource(BaseResource):
@@ -12,6 +23,30 @@ class GameResource(BaseResource):
     resource_name = 'game'
     model_cls = GameModel
     schema_cls = GameSchema
+    query_schema_cls = GameCollectionQuerySchema
+    load_fields = ('player', 'board', 'status', 'elapsed_seconds', 'updated', 'version', 'stats_recorded')
+    # Schemas for each board format that can be requested through the `board_format` query parameter
+    board_format_schemas = {
+        'lists': GameSchema,
+        'grid': GameGridSchema,
+        'bytes': GameBytesSchema,
+    }
+
+    def __init__(self):
+        super().__init__()
+        for schema_cls in self.board_format_schemas.values():
+            get_dumper(schema_cls)
+
+    def on_get(self, req, resp, **params):
+        """Overwrites BaseResource.on_get to add the cells within the region of a tiled board requested through the
+        `region` query parameter (as 'row,column,nbr_rows,nbr_columns'), in the 'grid' board format.
+        """
+        game_obj = self.get_or_raise_404(params[self.resource_name], only=self.load_fields)
+        region = self.get_board_region(req, game_obj)
+
+        resp.media = self.serialize(game_obj, schema_cls=self.get_response_schema_cls(req, game_obj))
+        if region is not None:
+            resp.media['board']['region'] = dump_region(game_obj.board, *region)
 
     def on_put(self, req, resp, **params):
         """Overwrites BaseResource.on_put to disable it.
@@ -36,14 +71,92 @@ class GameResource(BaseResource):
         # users from seing other users games
         return super().on_get_collection(req, resp, **params)
 
+    @classmethod
+    def get_board_region(cls, req, game_obj):
+        """Auxiliary method for loading the region of a tiled board requested through the `region` query parameter.
+
+        :param req: An HTTP request object
+        :type req: falcon.request.Request
+        :param game_obj: A minesweeper game object
+        :type game_obj: minesweeper.models.GameModel
+        :return: The row and column of the top left cell of the region, along with its number of rows and columns,
+        or None if no region was requested
+        :rtype: tuple | NoneType
+
+        :raise falcon.HTTPBadRequest: If the region is invalid, or the game board is not a tiled one
+        """
+        region = req.get_param('region')
+        if region is None:
+            return None
+
+        if game_obj.board.mode != 'tiled':
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description='Board regions are only supported by tiled boards.'
+            )
+
+        try:
+            row, column, nbr_rows, nbr_columns = (int(value) for value in region.split(','))
+        except ValueError:
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description='Board regions must be given as row,column,nbr_rows,nbr_columns.'
+            )
+
+        # Check both corners of the region are within the board
+        corners = ((row, column), (row + nbr_rows - 1, column + nbr_columns - 1))
+        if nbr_rows < 1 or nbr_columns < 1 or not all(game_obj.board.is_cell(cell) for cell in corners):
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description='Given region is not within the limits of the board.'
+            )
+
+        max_cells = (config['app']['game'].get('tiled') or {}).get('max_region_cells', 65536)
+        if nbr_rows * nbr_columns > max_cells:
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description=f'Board regions cannot exceed {max_cells} cells.'
+            )
+
+        return row, column, nbr_rows, nbr_columns
+
+    @classmethod
+    def get_response_schema_cls(cls, req, resource_obj):
+        """Overwrites BaseResource.get_response_schema_cls to serialize the game board in the format requested
+        through the `board_format` query parameter (either 'lists', 'grid' or 'bytes').
+
+        .note: Tiled boards are never sent whole, as their cells are left out of the 'lists' format.
+
+        :raise falcon.HTTPBadRequest: If the board format is unknown, or it is not supported by the game board
+        """
+        board_format = req.get_param('board_format', default='lists')
+        if board_format not in cls.board_format_schemas:
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description=f'Unknown board format {board_format}.'
+            )
+
+        # Tiled boards are too large to be sent whole
+        if board_format != 'lists' and resource_obj.board.mode != 'standard':
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description=f'Board format {board_format} is only supported by standard boards.'
+            )
+
+        return cls.board_format_schemas[board_format]
+
     def _create_resource(cls, resource_data):
         """Overwrites BaseResource._create_resource.
         """
-        # Find the user that is going to own the game
-        player_obj = UserResource.get_or_raise_404(resource_data.pop('player_id'))
+        # Find the user that is going to own the game, just to make sure it exists
+        player_obj = UserResource.get_or_raise_404(resource_data.pop('player_id'), only=('id',))
+
+        # Create the board object matching the requested mode
+        board_data = resource_data.pop('board')
+        board_obj = BOARD_MODELS[board_data.pop('mode', 'standard')](**board_data)
 
         # Create the game object
-        game_obj = cls.model_cls(**resource_data)
+        game_obj = cls.model_cls(board=board_obj, stats_recorded=False, **resource_data)
         game_obj.player = player_obj
 
         return game_obj
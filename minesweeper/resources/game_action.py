@@ -2,7 +2,8 @@ import falcon
 from marshmallow import ValidationError
 
 from .game import GameResource
-from minesweeper.serializers.game_action import BoardCellSchema
+from minesweeper.serializers.game import dump_delta
+from minesweeper.serializers.game_action import load_board_cell
 
 
 class GameActionResource(object):
@@ -12,6 +13,10 @@ class GameActionResource(object):
     def on_post(self, req, resp, **params):
         """Performs an action on a minesweeper game.
 
+        The whole game is returned by default, while `response=delta` returns only its status, elapsed time and
+        version, along with the cells changed by the action (in the 'grid' board format). Games on tiled boards
+        answer with the latter by default, as their cells are never sent whole.
+
         :param req: An HTTP request object
         :type req: falcon.request.Request
         :param resp: An HTTP response object
@@ -19,9 +24,19 @@ class GameActionResource(object):
 
         :raise falcon.HTTPBadRequest: If payload has invalid data to perform any action
         """
-        # Find requested game
+        # Find requested game, loading only the fields needed to play it and serialize it
         game_id = str(params[GameResource.resource_name])
-        game_obj = GameResource.get_or_raise_404(game_id)
+        game_obj = GameResource.get_or_raise_404(game_id, only=GameResource.load_fields)
+
+        # Choose the response format before applying any action: either the whole game or only its changes
+        response_format = req.get_param('response', default='full' if game_obj.board.mode == 'standard' else 'delta')
+        if response_format not in ('full', 'delta'):
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description=f'Unknown response format {response_format}.'
+            )
+        schema_cls = GameResource.get_response_schema_cls(req, game_obj)
+        checkpoint = game_obj.board.checkpoint() if response_format == 'delta' else None
 
         # Process requested action
         action = params['action'].lower()
@@ -40,9 +55,14 @@ class GameActionResource(object):
             self.process_cell_flag(req, game_obj)
         elif action == 'open':
             self.process_cell_open(req, game_obj)
+        elif action == 'chord':
+            self.process_cell_chord(req, game_obj)
 
-        game_obj.reload()
-        resp.media = GameResource.serialize(game_obj)
+        # The game object already holds the state stored by the action, so there is no need to reload it
+        if checkpoint is None:
+            resp.media = GameResource.serialize(game_obj, schema_cls=schema_cls)
+        else:
+            resp.media = dump_delta(game_obj, checkpoint)
 
     def process_game_start(self, game_obj):
         """Starts a minesweeper game.
@@ -125,6 +145,34 @@ class GameActionResource(object):
         # Open cell
         game_obj.open(cell)
 
+    def process_cell_chord(self, req, game_obj):
+        """Reveals the remaining neighbours of an opened game board cell whose flags match its value.
+
+        :param req: An HTTP request object
+        :type req: falcon.request.Request
+        :param game_obj: A minesweeper game object
+        :type game_obj: minesweeper.models.GameModel
+        """
+        # Load cell coordinates from request payload
+        cell = self.get_board_cell(game_obj, req.media)
+
+        # Verify cell is opened
+        if not game_obj.board.is_open(cell):
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description='Cannot chord a cell that is not opened.'
+            )
+
+        # Verify cell flagged neighbours match its value
+        if not game_obj.board.is_chordable(cell):
+            raise falcon.HTTPBadRequest(
+                title='Bad Request',
+                description='Cannot chord a cell whose flagged neighbours do not match its value.'
+            )
+
+        # Open cell neighbours
+        game_obj.chord(cell)
+
     @staticmethod
     def get_board_cell(game_obj, payload):
         """Parses the request payload and retrieves the coordinates of the cell on
@@ -134,6 +182,8 @@ class GameActionResource(object):
         :type game_obj: minesweeper.models.GameModel
         :param payload: A game action request payload
         :type payload: json
+        :return: The (row, column) coordinates of the cell
+        :rtype: tuple
         """
         # Verify game has started
         if not game_obj.started:
@@ -151,9 +201,8 @@ class GameActionResource(object):
 
         # Load cell from request payload
         try:
-            serializer = BoardCellSchema()
-            cell_data = serializer.load(payload)
-            cell = f"[{cell_data['row']}, {cell_data['column']}]"
+            cell_data = load_board_cell(payload)
+            cell = (cell_data['row'], cell_data['column'])
         except ValidationError as err:
             raise falcon.HTTPBadRequest(
                 f'Invalid game action payload',
@@ -1,6 +1,8 @@
 import falcon
+from mongoengine import NotUniqueError
 
 from .base import BaseResource
+from minesweeper.databases.base import get_repository
 from minesweeper.models.user import UserModel
 from minesweeper.serializers.user import UserSchema
 
@@ -11,14 +13,23 @@ class UserResource(BaseResource):
     resource_name = 'user'
     model_cls = UserModel
     schema_cls = UserSchema
+    load_fields = ('name_first', 'name_last', 'email', 'stats')
 
     def _create_resource(cls, resource_data):
         """Overwrites BaseResource._create_resource.
         """
-        # Check if new user email already exists in the database
-        if UserModel.objects(email=resource_data['email']).count():
+        return cls.model_cls(**resource_data)
+
+    def _save_resource(cls, resource_obj):
+        """Overwrites BaseResource._save_resource.
+
+        .note: Email addresses already in use are detected by the unique index on the user email, so that no
+        extra query is needed to check them.
+        """
+        try:
+            get_repository().save(resource_obj)
+        except NotUniqueError:
             raise falcon.HTTPBadRequest(
                 f'Invalid {cls.resource_name} payload',
-                {'email': [f'Address {resource_data["email"]} already in use.']}
+                {'email': [f'Address {resource_obj.email} already in use.']}
             )
-        return cls.model_cls(**resource_data)
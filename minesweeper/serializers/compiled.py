@@ -0,0 +1,115 @@
+from functools import lru_cache
+
+from marshmallow import (
+    fields,
+    missing,
+)
+from marshmallow.decorators import (
+    POST_DUMP,
+    PRE_DUMP,
+)
+from marshmallow.utils import get_func_args
+
+
+# Field classes whose values can be serialized with the field alone, out of the schema dump loop
+PLAIN_FIELDS = (fields.Boolean, fields.Dict, fields.Float, fields.Integer, fields.String)
+
+
+@lru_cache(maxsize=None)
+def get_schema(schema_cls):
+    """Returns the instance of a schema class shared by the whole application.
+
+    .note: Schema instances hold no state between calls, so a single one can load and dump any number of times.
+
+    :param schema_cls: A schema class
+    :type schema_cls: marshmallow.Schema
+    :return: The schema instance
+    :rtype: marshmallow.Schema
+    """
+    return schema_cls()
+
+
+@lru_cache(maxsize=None)
+def get_dumper(schema_cls):
+    """Returns a function serializing objects as the given schema class would, compiled on the first call.
+
+    :param schema_cls: A schema class
+    :type schema_cls: marshmallow.Schema
+    :return: A function taking an object and returning its serialized form
+    :rtype: function
+    """
+    schema = get_schema(schema_cls)
+    return compile_dumper(schema) or schema.dump
+
+
+def compile_dumper(schema):
+    """Builds a function serializing objects as a schema instance would, but without going through the
+    marshmallow per-field dispatch.
+
+    Each dumped field is turned into a direct getter: `fields.Function` fields call their serialize function,
+    nested schemas get compiled as well, and plain fields serialize the object attribute by themselves.
+
+    :param schema: A schema instance
+    :type schema: marshmallow.Schema
+    :return: The compiled function, or None if the schema uses features that can't be compiled (e.g. dump hooks)
+    :rtype: function | NoneType
+    """
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return None
+
+    getters = []
+    for name, field in schema.dump_fields.items():
+        getter = compile_field(field, field.attribute or name)
+        if getter is None:
+            return None
+        getters.append((field.data_key or name, getter))
+
+    def dump(obj):
+        result = {}
+        for key, getter in getters:
+            value = getter(obj)
+            if value is not missing:
+                result[key] = value
+        return result
+
+    return dump
+
+
+def compile_field(field, attribute):
+    """Builds a function returning the serialized value of a schema field for an object.
+
+    :param field: A schema field
+    :type field: marshmallow.fields.Field
+    :param attribute: The name of the object attribute the field is read from
+    :type attribute: string
+    :return: The compiled function (returning `marshmallow.missing` when the object lacks the attribute), or
+    None if the field can't be compiled
+    :rtype: function | NoneType
+    """
+    if field.dump_default is not missing:
+        return None
+
+    if type(field) is fields.Function:
+        if field.serialize_func is None or len(get_func_args(field.serialize_func)) > 1:
+            return None
+        return field.serialize_func
+
+    if type(field) is fields.Nested:
+        nested_dump = None if field.many else compile_dumper(field.schema)
+        if nested_dump is None:
+            return None
+
+        def get_nested(obj):
+            value = getattr(obj, attribute, missing)
+            return value if value is None or value is missing else nested_dump(value)
+        return get_nested
+
+    if type(field) in PLAIN_FIELDS:
+        serialize = field._serialize
+
+        def get_plain(obj):
+            value = getattr(obj, attribute, missing)
+            return value if value is missing else serialize(value, attribute, obj)
+        return get_plain
+
+    return None
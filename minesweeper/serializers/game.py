@@ -1,17 +1,168 @@
+from base64 import b64encode
+
 from bson import ObjectId
 
 from marshmallow import (
     EXCLUDE,
     fields,
+    missing,
     Schema,
+    validates_schema,
+    ValidationError,
 )
 
+from .loaders import load_object_id
+from .pagination import CollectionQuerySchema
 from .validators import (
+    validate_board_mode,
     validate_nbr_columns,
     validate_nbr_mines,
     validate_nbr_rows,
+    validate_seed,
     validate_status
 )
+from minesweeper.models.board import (
+    CELL_FLAGGED,
+    CELL_MINE,
+    CELL_OPENED,
+    CELL_VALUE_SHIFT,
+)
+
+
+def dump_cells(cells):
+    """Serializes a list of board cells into their string representation.
+
+    :param cells: A list of cells, given as tuples of (row, column) coordinates with optional trailing values
+    :type cells: list
+    :return: A sorted list of cells as strings (e.g. '[3, 7]')
+    :rtype: list
+    """
+    return sorted(str(list(cell)) for cell in cells)
+
+
+def dump_board_cells(board, name):
+    """Serializes one of the lists of cells of a board (see `dump_cells`).
+
+    .note: Tiled boards are too large to be listed, so they are sent by regions instead (see `dump_region`), and
+    game actions answer with the cells they changed (see `dump_delta`).
+
+    :param board: A board
+    :type board: minesweeper.models.board.BoardModel
+    :param name: The name of the list of cells (either 'mines', 'flagged' or 'opened')
+    :type name: string
+    :return: The serialized list of cells, or `marshmallow.missing` for tiled boards
+    :rtype: list | marshmallow.missing
+    """
+    if board.mode != 'standard':
+        return missing
+    return dump_cells(getattr(board, name))
+
+
+def build_grid_table():
+    """Builds the translation table from cell states (see `BoardModel.cells`) to the characters of the 'grid'
+    board format:
+
+        - '.': A hidden cell
+        - 'm': A hidden cell holding a mine
+        - 'f': A flagged cell
+        - 'F': A flagged cell holding a mine
+        - '0' to '8': An opened cell, along with the number of mines surrounding it
+        - '*': An opened cell holding a mine
+
+    :return: A table to be used with `bytes.translate`
+    :rtype: bytes
+    """
+    table = bytearray(256)
+    for state in range(256):
+        if state & CELL_OPENED:
+            char = '*' if state & CELL_MINE else str(min(state >> CELL_VALUE_SHIFT, 9))
+        elif state & CELL_FLAGGED:
+            char = 'F' if state & CELL_MINE else 'f'
+        else:
+            char = 'm' if state & CELL_MINE else '.'
+        table[state] = ord(char)
+    return bytes(table)
+
+
+# Translation table from cell states to characters of the 'grid' board format
+GRID_TABLE = build_grid_table()
+
+
+def dump_grid(board):
+    """Serializes the cells of a board as a grid of characters (see `build_grid_table`).
+
+    :param board: A board
+    :type board: minesweeper.models.board.BoardModel
+    :return: A string per board row, holding a character per cell
+    :rtype: list
+    """
+    grid = bytes(board.cells).translate(GRID_TABLE).decode('ascii')
+    return [grid[start:start + board.nbr_columns] for start in range(0, len(grid), board.nbr_columns)]
+
+
+def dump_region(board, row, column, nbr_rows, nbr_columns):
+    """Serializes the cells within a rectangular region of a tiled board as a grid of characters (see
+    `build_grid_table`).
+
+    :param board: A tiled board
+    :type board: minesweeper.models.tile.TiledBoardModel
+    :param row: The row of the top left cell of the region
+    :type row: int
+    :param column: The column of the top left cell of the region
+    :type column: int
+    :param nbr_rows: The number of rows of the region
+    :type nbr_rows: int
+    :param nbr_columns: The number of columns of the region
+    :type nbr_columns: int
+    :return: The region position and dimensions, along with a string per region row holding a character per cell
+    :rtype: dict
+    """
+    grid = board.region_states(row, column, nbr_rows, nbr_columns).translate(GRID_TABLE).decode('ascii')
+    return {
+        'row': row,
+        'column': column,
+        'nbr_rows': nbr_rows,
+        'nbr_columns': nbr_columns,
+        'grid': [grid[start:start + nbr_columns] for start in range(0, len(grid), nbr_columns)],
+    }
+
+
+def dump_bytes(board):
+    """Serializes the cells of a board as their base64-encoded states.
+
+    .note: States take a byte per cell in row-major order, holding the mine (0x01), flagged (0x02) and opened
+    (0x04) bits, and the number of surrounding mines in the upper 4 bits.
+
+    :param board: A board
+    :type board: minesweeper.models.board.BoardModel
+    :return: The base64-encoded cell states
+    :rtype: string
+    """
+    return b64encode(bytes(board.cells)).decode('ascii')
+
+
+def dump_delta(game, checkpoint):
+    """Serializes the changes made to a game since a checkpoint of its board was captured.
+
+    :param game: A game
+    :type game: minesweeper.models.game.GameModel
+    :param checkpoint: A checkpoint of the game board, as returned by `BoardModel.checkpoint`
+    :type checkpoint: object
+    :return: The game id, status, elapsed time and version, along with the [row, column, character] lists of
+    the cells whose character in the 'grid' board format changed
+    :rtype: dict
+    """
+    return {
+        'id': str(game.id),
+        'status': game.status,
+        'elapsed_time': game.elapsed_time,
+        'version': game.version,
+        'cells': [
+            [row, column, chr(GRID_TABLE[after])]
+            for row, column, before, after in game.board.changed_cells(checkpoint)
+            if GRID_TABLE[before] != GRID_TABLE[after]
+        ],
+    }
 
 
 class BoardSchema(Schema):
@@ -21,25 +172,43 @@ class BoardSchema(Schema):
         unknown = EXCLUDE
         ordered = True
 
+    mode = fields.String(
+        data_key='mode',
+        required=False,
+        allow_none=False,
+        validate=validate_board_mode,
+    )
+
     nbr_rows = fields.Int(
         data_key='nbr_rows',
         required=True,
         allow_none=False,
-        validate=validate_nbr_rows
     )
 
     nbr_columns = fields.Int(
         data_key='nbr_columns',
         required=True,
         allow_none=False,
-        validate=validate_nbr_columns
     )
 
     nbr_mines = fields.Int(
         data_key='nbr_mines',
         required=True,
         allow_none=False,
-        validate=validate_nbr_mines
+    )
+
+    tile_size = fields.Int(
+        data_key='tile_size',
+        required=False,
+        allow_none=True,
+        dump_only=True,
+    )
+
+    seed = fields.Int(
+        data_key='seed',
+        required=False,
+        allow_none=True,
+        validate=validate_seed
     )
 
     mines = fields.Function(
@@ -48,7 +217,7 @@ class BoardSchema(Schema):
         allow_none=False,
         dump_only=True,
         many=True,
-        serialize=lambda obj: sorted(obj.mines),
+        serialize=lambda obj: dump_board_cells(obj, 'mines'),
     )
 
     flagged = fields.Function(
@@ -57,7 +226,7 @@ class BoardSchema(Schema):
         allow_none=False,
         dump_only=True,
         many=True,
-        serialize=lambda obj: sorted(obj.flagged),
+        serialize=lambda obj: dump_board_cells(obj, 'flagged'),
     )
 
     opened = fields.Function(
@@ -66,7 +235,57 @@ class BoardSchema(Schema):
         allow_none=False,
         dump_only=True,
         many=True,
-        serialize=lambda obj: sorted(obj.opened),
+        serialize=lambda obj: dump_board_cells(obj, 'opened'),
+    )
+
+    @validates_schema
+    def validate_dimensions(self, data, **kwargs):
+        """Validates the board dimensions against the limits of the board mode.
+        """
+        mode = data.get('mode', 'standard')
+        if not validate_board_mode(mode):
+            return
+
+        errors = {}
+        if 'nbr_rows' in data and not validate_nbr_rows(data['nbr_rows'], mode):
+            errors['nbr_rows'] = ['Invalid value.']
+        if 'nbr_columns' in data and not validate_nbr_columns(data['nbr_columns'], mode):
+            errors['nbr_columns'] = ['Invalid value.']
+        if 'nbr_mines' in data and not errors:
+            nbr_cells = data.get('nbr_rows', 0) * data.get('nbr_columns', 0) or None
+            if not validate_nbr_mines(data['nbr_mines'], nbr_cells, mode):
+                errors['nbr_mines'] = ['Invalid value.']
+        if errors:
+            raise ValidationError(errors)
+
+
+class BoardGridSchema(BoardSchema):
+    """Serialization schema for BoardModel, with its cells in the 'grid' board format
+    """
+    class Meta(BoardSchema.Meta):
+        exclude = ('mines', 'flagged', 'opened')
+
+    grid = fields.Function(
+        data_key='grid',
+        required=True,
+        allow_none=False,
+        dump_only=True,
+        serialize=dump_grid,
+    )
+
+
+class BoardBytesSchema(BoardSchema):
+    """Serialization schema for BoardModel, with its cells in the 'bytes' board format
+    """
+    class Meta(BoardSchema.Meta):
+        exclude = ('mines', 'flagged', 'opened')
+
+    cells = fields.Function(
+        data_key='cells',
+        required=True,
+        allow_none=False,
+        dump_only=True,
+        serialize=dump_bytes,
     )
 
 
@@ -108,7 +327,54 @@ class GameSchema(Schema):
         dump_only=True,
     )
 
+    version = fields.Int(
+        data_key='version',
+        required=True,
+        allow_none=False,
+        dump_only=True,
+    )
+
     board = fields.Nested(
         'BoardSchema',
         required=True,
     )
+
+
+class GameGridSchema(GameSchema):
+    """Serialization schema for GameModel, with its board cells in the 'grid' board format
+    """
+    board = fields.Nested(
+        'BoardGridSchema',
+        required=True,
+        dump_only=True,
+    )
+
+
+class GameBytesSchema(GameSchema):
+    """Serialization schema for GameModel, with its board cells in the 'bytes' board format
+    """
+    board = fields.Nested(
+        'BoardBytesSchema',
+        required=True,
+        dump_only=True,
+    )
+
+
+class GameCollectionQuerySchema(CollectionQuerySchema):
+    """Serialization schema for the query parameters of a collection of GameModel
+    """
+    player = fields.Function(
+        data_key='player_id',
+        required=False,
+        allow_none=False,
+        load_only=True,
+        deserialize=load_object_id,
+    )
+
+    status = fields.String(
+        data_key='status',
+        required=False,
+        allow_none=False,
+        load_only=True,
+        validate=validate_status,
+    )
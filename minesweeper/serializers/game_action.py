@@ -4,6 +4,8 @@ from marshmallow import (
     Schema,
 )
 
+from .compiled import get_schema
+
 
 class BoardCellSchema(Schema):
     """Serialization schema for cells within the game board.
@@ -25,3 +27,21 @@ class BoardCellSchema(Schema):
         allow_none=False,
         load_only=True,
     )
+
+
+def load_board_cell(payload):
+    """Loads the cell of a game action payload, as `BoardCellSchema().load` would.
+
+    .note: Payloads holding plain integer coordinates are loaded straight away, any other payload goes through
+    the schema so that it gets the very same validation and error messages.
+
+    :param payload: A game action request payload
+    :type payload: json
+    :return: A dict with the cell 'row' and 'column'
+    :rtype: dict
+
+    :raise marshmallow.ValidationError: If the payload doesn't hold valid cell coordinates
+    """
+    if type(payload) is dict and type(payload.get('row')) is int and type(payload.get('column')) is int:
+        return {'row': payload['row'], 'column': payload['column']}
+    return get_schema(BoardCellSchema).load(payload)
@@ -1,3 +1,8 @@
+from base64 import urlsafe_b64decode
+from binascii import Error as BinasciiError
+
+from bson import ObjectId
+from bson.errors import InvalidId
 from marshmallow import ValidationError
 
 from .validators import (
@@ -31,3 +36,31 @@ def load_password(value):
     if not validate_password(value):
         raise ValidationError('Invalid value. Password must contain between 8 and 64 alphanumeric characters.')
     return secure_password(value)
+
+
+def load_cursor(value):
+    """Decodes a pagination cursor into the id of the last instance of the previous page.
+
+    :param value: An opaque pagination cursor, as returned by `minesweeper.serializers.pagination.dump_cursor`
+    :type value: string
+    :return: The id of the last instance of the previous page
+    :rtype: bson.ObjectId
+    """
+    try:
+        return ObjectId(urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+    except (BinasciiError, InvalidId, TypeError, ValueError):
+        raise ValidationError('Invalid cursor.')
+
+
+def load_object_id(value):
+    """Validates and loads an id value.
+
+    :param value: A string with an id value
+    :type value: string
+    :return: The id
+    :rtype: bson.ObjectId
+    """
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValidationError('Invalid value.')
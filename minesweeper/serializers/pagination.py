@@ -0,0 +1,62 @@
+from base64 import urlsafe_b64encode
+
+from marshmallow import (
+    EXCLUDE,
+    fields,
+    Schema,
+)
+
+from .loaders import load_cursor
+from .validators import (
+    validate_format,
+    validate_limit,
+)
+
+
+def dump_cursor(identifier):
+    """Encodes the id of the last instance of a page into an opaque pagination cursor.
+
+    :param identifier: The id of the last instance of a page
+    :type identifier: bson.ObjectId
+    :return: An opaque pagination cursor
+    :rtype: string
+    """
+    return urlsafe_b64encode(identifier.binary).decode().rstrip('=')
+
+
+class CollectionQuerySchema(Schema):
+    """Serialization schema for the query parameters of a collection of resources.
+
+    Collections are returned in pages of `limit` instances, unless the 'ndjson' `format` is requested, in which
+    case every instance is streamed (up to `limit` instances, if given).
+
+    .note: Schemas of resources supporting filters extend this one with a field per filter, named after the
+    model field it applies to.
+    """
+    class Meta:
+        unknown = EXCLUDE
+        ordered = True
+
+    limit = fields.Int(
+        data_key='limit',
+        required=False,
+        allow_none=False,
+        load_only=True,
+        validate=validate_limit,
+    )
+
+    format = fields.String(
+        data_key='format',
+        required=False,
+        allow_none=False,
+        load_only=True,
+        validate=validate_format,
+    )
+
+    after = fields.Function(
+        data_key='after',
+        required=False,
+        allow_none=False,
+        load_only=True,
+        deserialize=load_cursor,
+    )
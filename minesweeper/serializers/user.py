@@ -32,6 +32,15 @@ class UserStatsSchema(Schema):
         dump_only=True,
     )
 
+    best_times = fields.Dict(
+        data_key='best_times',
+        required=True,
+        allow_none=False,
+        dump_only=True,
+        keys=fields.String(),
+        values=fields.Int(),
+    )
+
 
 class UserSchema(Schema):
     """Serialization schema for UserModel
@@ -3,6 +3,27 @@ import re
 from minesweeper.config import config
 
 
+def get_board_config(mode='standard'):
+    """Returns the board size limits for the given board mode.
+
+    :param mode: A board mode
+    :type mode: string
+    :return: A dict with the 'max_rows', 'max_columns' and 'max_mines' limits
+    :rtype: dict
+    """
+    if mode == 'tiled':
+        game_config = config['app']['game'].get('tiled') or {}
+        default_max = 5000
+    else:
+        game_config = config['app']['game']
+        default_max = 99
+    return {
+        'max_rows': game_config.get('max_rows', default_max),
+        'max_columns': game_config.get('max_columns', default_max),
+        'max_mines': game_config.get('max_mines'),
+    }
+
+
 def validate_email(value):
     """Validates email address value.
 
@@ -14,6 +35,28 @@ def validate_email(value):
     return value is None or bool(re.match(r'[^@]+@[^@]+\.[^@]+', value))
 
 
+def validate_format(value):
+    """Validates a value for the format of a collection response
+
+    :param value: A candidate value for a response format
+    :type value: string
+    :return: True if value is either 'json' or 'ndjson'. Otherwise returns False
+    :rtype: bool
+    """
+    return value in ('json', 'ndjson')
+
+
+def validate_limit(value):
+    """Validates a value for the number of instances in a page of a collection
+
+    :param value: A candidate value for a page limit
+    :type value: int
+    :return: True if value is between 1 and the configured `max_limit`. Otherwise returns False
+    :rtype: bool
+    """
+    return 1 <= value <= (config['app'].get('pagination') or {}).get('max_limit', 200)
+
+
 def validate_name(value):
     """Validates name value.
 
@@ -25,38 +68,58 @@ def validate_name(value):
     return value is None or validate_str_length(value, 1, 255)
 
 
-def validate_nbr_rows(value):
+def validate_board_mode(value):
+    """Validates a board mode value
+
+    :param value: A candidate value for board mode
+    :type value: string
+    :return: True if values is among the board mode choices. Otherwise returns False
+    :rtype: bool
+    """
+    return value in ('standard', 'tiled')
+
+
+def validate_nbr_rows(value, mode='standard'):
     """Validates a value for number of rows value
 
     :param value: A candidate value for number of rows
     :type value: int
+    :param mode: The mode of the board the value is meant for
+    :type mode: string
     :return: True if values is a valid number of rows. Otherwise returns False
     :rtype: bool
     """
-    return 2 <= value <= config['app']['game'].get('max_rows', 99)
+    return 2 <= value <= get_board_config(mode)['max_rows']
 
 
-def validate_nbr_columns(value):
+def validate_nbr_columns(value, mode='standard'):
     """Validates a value for number of columns value
 
     :param value: A candidate value for number of columns
     :type value: int
+    :param mode: The mode of the board the value is meant for
+    :type mode: string
     :return: True if values is a valid number of columns. Otherwise returns False
     :rtype: bool
     """
-    return 2 <= value <= config['app']['game'].get('max_columns', 99)
+    return 2 <= value <= get_board_config(mode)['max_columns']
 
 
-def validate_nbr_mines(value):
+def validate_nbr_mines(value, nbr_cells=None, mode='standard'):
     """Validates a value for number of mines value
 
     :param value: A candidate value for number of mines
     :type value: int
+    :param nbr_cells: The number of cells of the board the value is meant for, if known
+    :type nbr_cells: int | NoneType
+    :param mode: The mode of the board the value is meant for
+    :type mode: string
     :return: True if values is a valid number of mines. Otherwise returns False
     :rtype: bool
     """
-    max_nbr_cells = config['app']['game'].get('max_rows', 99) * config['app']['game'].get('max_columns', 99)
-    return 1 <= value <= (config['app']['game'].get('max_mines') or max_nbr_cells - 1)
+    board_config = get_board_config(mode)
+    max_nbr_cells = nbr_cells or board_config['max_rows'] * board_config['max_columns']
+    return 1 <= value <= min(board_config['max_mines'] or max_nbr_cells, max_nbr_cells - 1)
 
 
 def validate_password(value):
@@ -77,6 +140,17 @@ def validate_password(value):
     return has_valid_length and has_alpha and has_digits
 
 
+def validate_seed(value):
+    """Validates a value for a board seed
+
+    :param value: A candidate value for a board seed
+    :type value: int | NoneType
+    :return: True if values is a valid board seed or None. Otherwise returns False
+    :rtype: bool
+    """
+    return value is None or 0 <= value < 2 ** 32
+
+
 def validate_status(value):
     """Validates a status value
 